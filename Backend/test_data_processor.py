@@ -0,0 +1,87 @@
+"""
+Tests for measurement cleaning in DataProcessor.
+"""
+import sys
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.append('.')
+
+from utils.data_processor import DataProcessor
+
+
+def make_mixed_batch():
+    """A batch mixing naive, 'Z', '+00:00' and non-UTC offsets with rows that must be rejected."""
+    base = (datetime.utcnow() - timedelta(days=1)).replace(microsecond=0)
+    naive = base.isoformat()
+
+    def row(date_utc, value=12.5, unit='µg/m³', parameter='PM2.5', city='Denver'):
+        return {
+            'city': city,
+            'parameter': parameter,
+            'value': value,
+            'unit': unit,
+            'date_utc': date_utc,
+            'source': 'openaq'
+        }
+
+    return [
+        row(naive),
+        row(naive + 'Z'),
+        row(naive + '+00:00'),
+        row(naive + '+05:00', parameter='O3'),
+        row((base - timedelta(hours=3)).isoformat() + '-07:00', parameter='NO2'),
+        row((base - timedelta(days=400)).isoformat() + 'Z'),
+        row(naive + 'Z', value='not a number'),
+        row(naive + 'Z', value=900.0),
+        row('not a date'),
+    ]
+
+
+def test_fast_and_per_row_cleaning_agree():
+    """The column-wise fast path and the per-row path keep the same rows with the same values."""
+    batch = make_mixed_batch()
+    window = DataProcessor._date_window()
+
+    fast = DataProcessor._fast_clean(batch)
+    per_row = [
+        cleaned
+        for cleaned in (DataProcessor._clean_single_measurement(m, window) for m in batch)
+        if cleaned
+    ]
+
+    assert len(fast) == 5, fast
+    assert fast == per_row
+    assert all(m['date_utc'].tzinfo is None for m in per_row)
+
+    # '+05:00' is normalized to the same instant in UTC
+    assert per_row[3]['date_utc'] == per_row[0]['date_utc'] - timedelta(hours=5)
+
+
+def test_aggregate_measurements_hourly():
+    """Hourly aggregation averages each (city, parameter, hour) and returns naive datetimes."""
+    hour = datetime(2024, 5, 1, 14)
+    measurements = [
+        {'city': 'Denver', 'parameter': 'PM2.5', 'value': value, 'unit': 'µg/m³',
+         'date_utc': hour + timedelta(minutes=minutes), 'source': 'openaq'}
+        for value, minutes in [(10.0, 5), (20.0, 35), (40.0, 65)]
+    ]
+
+    aggregated = DataProcessor.aggregate_measurements(measurements, 'hourly')
+
+    assert [(m['date_utc'], m['value']) for m in aggregated] == [
+        (hour, 15.0),
+        (hour + timedelta(hours=1), 40.0),
+    ]
+    assert all(type(m['date_utc']) is datetime for m in aggregated)
+
+
+if __name__ == "__main__":
+    tests = [
+        test_fast_and_per_row_cleaning_agree,
+        test_aggregate_measurements_hourly,
+    ]
+
+    for test_func in tests:
+        test_func()
+        print(f"SUCCESS: {test_func.__name__}")
@@ -0,0 +1,192 @@
+"""
+Offline tests for the OpenAQ client.
+
+Requests go through the client's real sessions; a fake transport adapter
+answers them so no network access is needed.
+"""
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.response import HTTPResponse
+
+# Add current directory to path
+sys.path.append('.')
+
+from utils import openaq_client
+from utils.openaq_client import OpenAQClient
+
+
+class FakeOpenAQAdapter(BaseAdapter):
+    """Transport adapter that answers OpenAQ requests from a handler function."""
+
+    def __init__(self, handler, compress=False, content_length=True):
+        super().__init__()
+        self.handler = handler
+        self.compress = compress
+        self.content_length = content_length
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        query = {key: values[0] for key, values in parse_qs(urlparse(request.url).query).items()}
+        self.requests.append(query)
+
+        body = json.dumps(self.handler(urlparse(request.url).path, query)).encode()
+        headers = {'Content-Type': 'application/json'}
+        if self.compress:
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        if self.content_length:
+            headers['Content-Length'] = str(len(body))
+        raw = HTTPResponse(
+            body=io.BytesIO(body),
+            headers=headers,
+            status=200,
+            reason='OK',
+            preload_content=False,
+            decode_content=False
+        )
+        return HTTPAdapter().build_response(request, raw)
+
+    def close(self):
+        pass
+
+
+def make_client(handler, **adapter_options):
+    """Create a client whose sessions are served by a FakeOpenAQAdapter."""
+    cache_dir = tempfile.mkdtemp()
+    client = OpenAQClient(
+        base_url="https://openaq.test/v2",
+        cache_name=os.path.join(cache_dir, "openaq_cache")
+    )
+    adapter = FakeOpenAQAdapter(handler, **adapter_options)
+    client.session.mount('https://', adapter)
+    client.stream_session.mount('https://', adapter)
+    return client, adapter
+
+
+def cities_handler(path, query):
+    """Serve a /cities listing with a missing and a blank city name."""
+    assert path.endswith('/cities')
+    return {'results': [{'city': 'Denver'}, {'city': None}, {'city': 'Austin'}, {}]}
+
+
+def test_get_available_cities():
+    """Small city listings are decoded in one go, with blank names dropped and sorted."""
+    client, adapter = make_client(cities_handler)
+
+    cities = client.get_available_cities("US")
+    assert cities == ['Austin', 'Denver'], cities
+    assert adapter.requests[0]['country'] == 'US'
+
+    # The second call is answered from the parsed-listing cache
+    assert client.get_available_cities("US") == ['Austin', 'Denver']
+    assert len(adapter.requests) == 1
+
+
+def test_get_available_cities_streams_large_listing():
+    """Listings of unknown size are parsed incrementally from the decompressed stream."""
+    if openaq_client.ijson is None:
+        print("SKIPPED: ijson is not installed")
+        return
+
+    client, adapter = make_client(cities_handler, compress=True, content_length=False)
+
+    def fail_decode(response):
+        raise AssertionError("streamed listing was decoded in one go")
+
+    decode_json = openaq_client._decode_json
+    openaq_client._decode_json = fail_decode
+    try:
+        cities = client.get_available_cities("US")
+    finally:
+        openaq_client._decode_json = decode_json
+
+    assert cities == ['Austin', 'Denver'], cities
+    assert len(adapter.requests) == 1
+
+
+def measurements_handler(total):
+    """Serve `total` /measurements records, paged the way OpenAQ pages them."""
+    start = datetime(2024, 5, 1)
+
+    def handler(path, query):
+        assert path.endswith('/measurements')
+        limit = int(query['limit'])
+        offset = (int(query['page']) - 1) * limit
+        return {
+            'results': [
+                {
+                    'value': float(i),
+                    'unit': 'µg/m³',
+                    'date': {'utc': (start + timedelta(minutes=i)).isoformat() + 'Z'}
+                }
+                for i in range(offset, min(offset + limit, total))
+            ]
+        }
+
+    return handler
+
+
+def fetch_pages(client, limit):
+    """Run _iter_parameter_pages for one parameter and return the yielded frames."""
+    return list(client._iter_parameter_pages(
+        "Denver", "pm25", limit, datetime(2024, 5, 1), datetime(2024, 5, 8)
+    ))
+
+
+def test_iter_parameter_pages_stops_on_short_page():
+    """Paging ends after the first page with fewer records than requested."""
+    client, adapter = make_client(measurements_handler(25))
+    client.PAGE_SIZE = 10
+
+    frames = fetch_pages(client, 100)
+
+    assert [len(frame) for frame in frames] == [10, 10, 5]
+    assert [query['page'] for query in adapter.requests] == ['1', '2', '3']
+
+
+def test_iter_parameter_pages_caps_at_limit():
+    """No more than `limit` records are returned, without repeating or skipping any."""
+    client, adapter = make_client(measurements_handler(100))
+    client.PAGE_SIZE = 10
+
+    frames = fetch_pages(client, 25)
+
+    assert [len(frame) for frame in frames] == [10, 10, 5]
+    values = [value for frame in frames for value in frame['value']]
+    assert values == [float(i) for i in range(25)]
+    assert {query['limit'] for query in adapter.requests} == {'10'}
+
+
+def test_iter_parameter_pages_without_limit():
+    """With limit=None every record is fetched."""
+    client, adapter = make_client(measurements_handler(30))
+    client.PAGE_SIZE = 10
+
+    frames = fetch_pages(client, None)
+
+    assert sum(len(frame) for frame in frames) == 30
+    # The fourth request returns an empty page and ends the stream
+    assert len(adapter.requests) == 4
+    assert frames[0]['parameter'].iloc[0] == 'PM2.5'
+
+
+if __name__ == "__main__":
+    tests = [
+        test_get_available_cities,
+        test_get_available_cities_streams_large_listing,
+        test_iter_parameter_pages_stops_on_short_page,
+        test_iter_parameter_pages_caps_at_limit,
+        test_iter_parameter_pages_without_limit,
+    ]
+
+    for test_func in tests:
+        test_func()
+        print(f"SUCCESS: {test_func.__name__}")
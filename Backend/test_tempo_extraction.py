@@ -0,0 +1,232 @@
+"""
+Tests for TEMPO pixel extraction on a small synthetic NetCDF granule.
+
+The granule covers Philadelphia and New York plus open country between and
+around them, so it exercises nearest-city assignment and the catchment drop.
+"""
+import importlib
+import math
+import os
+import sys
+import subprocess
+import tempfile
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Add current directory to path
+sys.path.append('.')
+
+from utils import tempo_client
+
+NO2_SCALE = 1e-6
+NO2_FILL = -999
+
+
+def write_synthetic_granule(path):
+    """Write a TEMPO-like granule with (y, x, time) variables chunked along time."""
+    lat_axis = np.arange(39.50, 41.26, 0.125)
+    lon_axis = np.arange(-75.75, -73.49, 0.125)
+    lats, lons = np.meshgrid(lat_axis, lon_axis, indexing='ij')
+    times = pd.date_range('2024-05-01 14:00', periods=5, freq='h')
+    shape = lats.shape + (times.size,)
+
+    rng = np.random.default_rng(42)
+    no2 = rng.integers(0, 30000, size=shape).astype(float)
+    no2[rng.random(shape) < 0.1] = np.nan
+    o3 = rng.random(shape).astype(np.float32)
+    o3[rng.random(shape) < 0.1] = np.nan
+
+    ds = xr.Dataset(
+        {
+            'NO2': (('y', 'x', 'time'), no2 * NO2_SCALE),
+            'O3': (('y', 'x', 'time'), o3),
+            'latitude': (('y', 'x'), lats.astype(np.float32)),
+            'longitude': (('y', 'x'), lons.astype(np.float32)),
+        },
+        coords={'time': times}
+    )
+    chunks = lats.shape + (2,)
+    ds.to_netcdf(path, engine='h5netcdf', encoding={
+        'NO2': {'dtype': 'int16', 'scale_factor': NO2_SCALE, '_FillValue': NO2_FILL, 'chunksizes': chunks},
+        'O3': {'chunksizes': chunks},
+        'time': {'units': 'seconds since 2024-05-01'},
+    })
+
+
+def brute_force_measurements(path):
+    """Expected rows, computed pixel by pixel with a plain haversine loop over the cities."""
+    with xr.open_dataset(path, engine='h5netcdf', mask_and_scale=False) as ds:
+        lats = ds.latitude.values
+        lons = ds.longitude.values
+        times = pd.to_datetime(ds.time.values)
+        raw = {'NO2': ds.NO2.values, 'O3': ds.O3.values}
+
+    rows = []
+    for i in range(lats.shape[0]):
+        for j in range(lats.shape[1]):
+            best_km, best_city = math.inf, None
+            for city_lat, city_lon, city_name in tempo_client._CITY_MAPPING:
+                dlat = math.radians(float(lats[i, j]) - city_lat)
+                dlon = math.radians(float(lons[i, j]) - city_lon)
+                a = (math.sin(dlat / 2) ** 2
+                     + math.cos(math.radians(float(lats[i, j]))) * math.cos(math.radians(city_lat))
+                     * math.sin(dlon / 2) ** 2)
+                km = 2 * tempo_client._EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+                if km < best_km:
+                    best_km, best_city = km, city_name
+            if best_km > tempo_client._CATCHMENT_KM:
+                continue
+
+            for param, data in raw.items():
+                for k in range(times.size):
+                    value = data[i, j, k]
+                    if param == 'NO2':
+                        if value == NO2_FILL:
+                            continue
+                        value = np.float32(value) * np.float32(NO2_SCALE)
+                    if not np.isfinite(value):
+                        continue
+                    rows.append((best_city, param, times[k], float(lats[i, j]), float(lons[i, j]), float(value)))
+
+    return sorted(rows)
+
+
+def as_rows(frame):
+    """Measurement frame as sorted plain tuples, comparable with brute_force_measurements."""
+    return sorted(zip(
+        frame['city'].astype(str),
+        frame['parameter'].astype(str),
+        frame['date_utc'],
+        frame['latitude'].astype(float),
+        frame['longitude'].astype(float),
+        frame['value'].astype(float)
+    ))
+
+
+def assert_same_rows(actual, expected):
+    """Rows match exactly on keys and to float32 precision on values."""
+    assert len(actual) == len(expected), (len(actual), len(expected))
+    assert [row[:5] for row in actual] == [row[:5] for row in expected]
+    np.testing.assert_allclose([row[5] for row in actual], [row[5] for row in expected], rtol=1e-6)
+
+
+def make_granule():
+    """Path of a fresh synthetic granule in a temporary directory."""
+    path = os.path.join(tempfile.mkdtemp(), 'TEMPO_synthetic.nc')
+    write_synthetic_granule(path)
+    return path
+
+
+def test_city_grid_matches_brute_force():
+    """Nearest city and catchment membership agree with a per-pixel haversine loop."""
+    path = make_granule()
+    with xr.open_dataset(path, engine='h5netcdf') as ds:
+        lats = ds.latitude.values
+        lons = ds.longitude.values
+
+    city_grid, in_catchment = tempo_client._city_grid(lats, lons)
+
+    expected_cities = {(row[3], row[4]): row[0] for row in brute_force_measurements(path)}
+    kept = {
+        (float(lats[i, j]), float(lons[i, j])): tempo_client._CITY_NAMES[city_grid[i, j]]
+        for i, j in zip(*np.nonzero(in_catchment))
+    }
+    assert kept == expected_cities
+
+    # The grid spans more than the two catchments, so some pixels are dropped
+    assert 0 < in_catchment.sum() < in_catchment.size
+    assert set(kept.values()) == {'New York', 'Philadelphia'}
+
+
+def test_extract_measurements_matches_brute_force():
+    """The xarray reader keeps exactly the valid in-catchment pixels, with categorical labels."""
+    path = make_granule()
+
+    frame = tempo_client._process_tempo_file(path, ['NO2', 'O3'], granule_id=3)
+
+    assert_same_rows(as_rows(frame), brute_force_measurements(path))
+    assert isinstance(frame['city'].dtype, pd.CategoricalDtype)
+    assert isinstance(frame['parameter'].dtype, pd.CategoricalDtype)
+    assert (frame['granule_id'] == 3).all()
+
+
+def test_h5py_reader_matches_xarray():
+    """The direct h5py reader produces the same frame as the xarray reader."""
+    path = make_granule()
+
+    h5py_frames = tempo_client._read_tempo_file_h5py(path, ['NO2', 'O3'])
+    xarray_frames = tempo_client._read_tempo_file_xarray(path, ['NO2', 'O3'])
+
+    assert h5py_frames is not None
+    pd.testing.assert_frame_equal(
+        tempo_client.concat_measurement_frames(h5py_frames),
+        tempo_client.concat_measurement_frames(xarray_frames)
+    )
+
+
+def test_numba_kernels_match_numpy():
+    """NASA_USE_NUMBA=1 gives the same measurements as the NumPy path."""
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        print("SKIPPED: numba is not installed")
+        return
+
+    path = make_granule()
+    numpy_frame = tempo_client._process_tempo_file(path, ['NO2', 'O3'])
+
+    os.environ['NASA_USE_NUMBA'] = '1'
+    try:
+        importlib.reload(tempo_client)
+        assert tempo_client._USE_NUMBA
+        numba_frame = tempo_client._process_tempo_file(path, ['NO2', 'O3'])
+    finally:
+        del os.environ['NASA_USE_NUMBA']
+        importlib.reload(tempo_client)
+
+    # Pixel order within a block can differ between the kernels, so compare row sets
+    assert_same_rows(as_rows(numba_frame), as_rows(numpy_frame))
+
+
+def test_process_pool_after_in_process_read():
+    """A multi-granule pool still completes after a single granule was read in-process."""
+    files = [make_granule() for _ in range(3)]
+
+    # Run in a fresh interpreter so a deadlocked pool fails the test instead of hanging it
+    script = (
+        "from utils import tempo_client\n"
+        f"files = {files!r}\n"
+        "single = tempo_client._process_tempo_files(files[:1], ['NO2', 'O3'])\n"
+        "pooled = tempo_client._process_tempo_files(files, ['NO2', 'O3'])\n"
+        "print(len(single[0]), [len(frame) for frame in pooled])\n"
+    )
+    try:
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            timeout=120
+        )
+    except subprocess.TimeoutExpired:
+        raise AssertionError("process pool did not finish")
+
+    assert result.returncode == 0, result.stderr
+    single_rows, pooled_rows = result.stdout.split(' ', 1)
+    assert int(single_rows) > 0
+    assert pooled_rows.strip() == str([int(single_rows)] * 3)
+
+if __name__ == "__main__":
+    tests = [
+        test_city_grid_matches_brute_force,
+        test_extract_measurements_matches_brute_force,
+        test_h5py_reader_matches_xarray,
+        test_numba_kernels_match_numpy,
+        test_process_pool_after_in_process_read,
+    ]
+
+    for test_func in tests:
+        test_func()
+        print(f"SUCCESS: {test_func.__name__}")
@@ -3,12 +3,66 @@ Data processing utilities for cleaning and validating air quality data.
 """
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
 import logging
 
+try:
+    import numexpr as ne
+except ImportError:  # numexpr is optional; fall back to plain NumPy
+    ne = None
+
 logger = logging.getLogger(__name__)
 
+# Column layout shared by every client that returns measurement frames
+MEASUREMENT_COLUMNS = ['city', 'parameter', 'value', 'unit', 'date_utc', 'source']
+
+
+def build_measurement_frame(
+    city: Any,
+    parameter: Any,
+    values: Any,
+    units: Any,
+    dates: Any,
+    source: Any,
+    lats: Any = None,
+    lons: Any = None
+) -> pd.DataFrame:
+    """
+    Build a columnar measurement frame.
+    
+    Each argument is either a per-row array or a scalar that is broadcast
+    over all rows. Callers that need dictionaries should call
+    .to_dict('records') at the JSON boundary only.
+    
+    Returns:
+        DataFrame with MEASUREMENT_COLUMNS, plus latitude/longitude when given
+    """
+    columns = {
+        'city': city,
+        'parameter': parameter,
+        'value': values,
+        'unit': units,
+        'date_utc': dates,
+        'source': source,
+    }
+    if lats is not None:
+        columns['latitude'] = lats
+    if lons is not None:
+        columns['longitude'] = lons
+    return pd.DataFrame(columns)
+
+
+def concat_measurement_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate measurement frames, returning an empty frame when there are none.
+    """
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=MEASUREMENT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
 class DataProcessor:
     """
     Utility class for processing and cleaning air quality data.
@@ -40,36 +94,185 @@ class DataProcessor:
         'NO2': 46.0,
         'HCHO': 30.0,
     }
-    
+
+    # Keys every measurement dictionary is expected to carry
+    REQUIRED_KEYS = ['city', 'parameter', 'value', 'unit', 'date_utc', 'source']
+
+    # Arrays at least this long have their outlier scores evaluated with numexpr
+    NUMEXPR_MIN_SIZE = 10_000
+
     @classmethod
-    def clean_measurements(cls, measurements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def clean_measurements(
+        cls,
+        measurements: List[Dict[str, Any]],
+        keep_original: bool = False
+    ) -> List[Dict[str, Any]]:
         """
         Clean and validate a list of measurements.
-        
+
+        Batches that share a single schema (e.g. one TEMPO download) are cleaned
+        column-wise; anything else goes through the per-row path.
+
         Args:
             measurements: List of measurement dictionaries
-        
+            keep_original: Attach each input dictionary as 'original_data'
+
         Returns:
             List of cleaned and validated measurements
         """
-        cleaned = []
-        
+        if measurements and cls._is_homogeneous(measurements):
+            try:
+                cleaned = cls._fast_clean(measurements, keep_original)
+                logger.info(f"Cleaned {len(cleaned)} out of {len(measurements)} measurements")
+                return cleaned
+            except Exception as e:
+                logger.warning(f"Fast cleaning path failed, falling back to per-row cleaning: {e}")
+
+        # Preallocate and fill in place; rejected rows are sliced off at the end
+        cleaned = [None] * len(measurements)
+        count = 0
+        window = cls._date_window()
+
         for measurement in measurements:
             try:
-                cleaned_measurement = cls._clean_single_measurement(measurement)
+                cleaned_measurement = cls._clean_single_measurement(measurement, window, keep_original)
                 if cleaned_measurement:
-                    cleaned.append(cleaned_measurement)
+                    cleaned[count] = cleaned_measurement
+                    count += 1
             except Exception as e:
                 logger.error(f"Error cleaning measurement: {e}")
                 continue
         
+        del cleaned[count:]
         logger.info(f"Cleaned {len(cleaned)} out of {len(measurements)} measurements")
         return cleaned
-    
+
+    @classmethod
+    def _is_homogeneous(cls, measurements: List[Dict[str, Any]]) -> bool:
+        """
+        Check whether a batch looks like it came from a single source with a fixed schema.
+        Only the first few rows are probed; the fast path validates every row anyway.
+        """
+        probe = measurements[:8]
+        return all(
+            isinstance(m, dict)
+            and isinstance(m.get('date_utc'), str)
+            and all(key in m for key in cls.REQUIRED_KEYS)
+            for m in probe
+        )
+
     @classmethod
-    def _clean_single_measurement(cls, measurement: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _fast_clean(
+        cls,
+        measurements: List[Dict[str, Any]],
+        keep_original: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Clean a homogeneous batch column-wise instead of row by row.
+        Applies the same rules as _clean_single_measurement.
+        """
+        df = pd.DataFrame(measurements, columns=cls.REQUIRED_KEYS)
+
+        # Non-string fields become NaN and are rejected below
+        city = df['city'].str.strip()
+        parameter = df['parameter'].str.strip()
+        unit = df['unit'].str.strip()
+        value = pd.to_numeric(df['value'], errors='coerce')
+        date_utc = pd.to_datetime(
+            df['date_utc'], errors='coerce', utc=True, format='ISO8601'
+        ).dt.tz_localize(None)
+
+        # Validate required fields and date window, combining masks in place
+        earliest, latest = cls._date_window()
+        dates = date_utc.to_numpy()
+        valid = (city.str.len() > 0).to_numpy()
+        valid &= (parameter.str.len() > 0).to_numpy()
+        valid &= (unit.str.len() > 0).to_numpy()
+        valid &= value.notna().to_numpy()
+        valid &= dates >= np.datetime64(earliest)
+        valid &= dates <= np.datetime64(latest)
+
+        positions = np.flatnonzero(valid)
+        if positions.size == 0:
+            return []
+
+        # Resolve unit conversion and range once per distinct (unit, parameter) pair
+        pairs = pd.DataFrame({'unit': unit.iloc[positions], 'parameter': parameter.iloc[positions]})
+        codes = pairs.groupby(['unit', 'parameter'], sort=False).ngroup().to_numpy()
+        rules = [
+            cls._conversion_rule(pair_unit, pair_param)
+            for pair_unit, pair_param in pairs.drop_duplicates().itertuples(index=False)
+        ]
+        factors = np.array([rule[0] for rule in rules], dtype=float)[codes]
+        converted_units = np.array([rule[1] for rule in rules], dtype=object)[codes]
+        lower = np.array([rule[2] for rule in rules], dtype=float)[codes]
+        upper = np.array([rule[3] for rule in rules], dtype=float)[codes]
+        normalized = np.array([rule[4] for rule in rules], dtype=object)[codes]
+
+        converted = value.iloc[positions].to_numpy(dtype=float) * factors
+        keep = converted >= lower
+        keep &= converted <= upper
+
+        positions = positions[keep]
+
+        cleaned = [
+            {
+                'city': row_city,
+                'parameter': row_param,
+                'value': row_value,
+                'unit': row_unit,
+                'date_utc': row_date,
+                'source': row_source
+            }
+            for row_city, row_param, row_value, row_unit, row_date, row_source in zip(
+                city.iloc[positions],
+                normalized[keep],
+                converted[keep].tolist(),
+                converted_units[keep],
+                pd.DatetimeIndex(date_utc.iloc[positions]).to_pydatetime(),
+                df['source'].iloc[positions]
+            )
+        ]
+
+        if keep_original:
+            for cleaned_measurement, i in zip(cleaned, positions):
+                cleaned_measurement['original_data'] = measurements[i]
+
+        return cleaned
+
+    @staticmethod
+    def _date_window() -> Tuple[datetime, datetime]:
+        """Return the (earliest, latest) accepted measurement time, relative to now."""
+        now = datetime.utcnow()
+        return now - timedelta(days=365), now + timedelta(days=1)
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def _conversion_rule(cls, unit: str, parameter: str) -> Tuple[float, str, float, float, str]:
+        """
+        Return (factor, converted_unit, min_value, max_value, normalized_parameter)
+        for a unit/parameter pair. The factor is NaN when the unit cannot be converted.
+        Cached, since a batch only ever contains a handful of distinct pairs.
+        """
+        factor, converted_unit = cls._convert_units(1.0, unit, parameter)
+        min_val, max_val = cls.PARAMETER_RANGES.get(parameter, (-np.inf, np.inf))
+        normalized_param = cls._normalize_parameter_name(parameter)
+        return (np.nan if factor is None else factor), converted_unit, min_val, max_val, normalized_param
+
+    @classmethod
+    def _clean_single_measurement(
+        cls,
+        measurement: Dict[str, Any],
+        window: Optional[Tuple[datetime, datetime]] = None,
+        keep_original: bool = False
+    ) -> Optional[Dict[str, Any]]:
         """
         Clean and validate a single measurement.
+        
+        Args:
+            measurement: Measurement dictionary
+            window: Precomputed (earliest, latest) date window; computed if not given
+            keep_original: Attach the input dictionary as 'original_data'
         """
         try:
             # Extract and validate required fields
@@ -99,32 +302,33 @@ class DataProcessor:
             elif not isinstance(date_utc, datetime):
                 return None
             
-            # Check if date is reasonable (not too far in past or future)
-            now = datetime.utcnow()
-            if date_utc < now - timedelta(days=365) or date_utc > now + timedelta(days=1):
-                return None
+            # Offset-aware dates are stored as naive UTC, matching _fast_clean
+            if date_utc.tzinfo is not None:
+                date_utc = date_utc.astimezone(timezone.utc).replace(tzinfo=None)
             
-            # Convert units to µg/m³
-            converted_value, converted_unit = cls._convert_units(value, unit, parameter)
-            if converted_value is None:
+            # Check if date is reasonable (not too far in past or future)
+            earliest, latest = window or cls._date_window()
+            if date_utc < earliest or date_utc > latest:
                 return None
             
-            # Validate value range
-            if not cls._validate_value_range(converted_value, parameter):
+            # Convert units to µg/m³ and validate range with the cached rule for this pair
+            factor, converted_unit, min_val, max_val, normalized_param = cls._conversion_rule(unit, parameter)
+            converted_value = value * factor
+            if not min_val <= converted_value <= max_val:
                 return None
             
-            # Normalize parameter name
-            normalized_param = cls._normalize_parameter_name(parameter)
-            
-            return {
+            cleaned = {
                 'city': city,
                 'parameter': normalized_param,
                 'value': converted_value,
                 'unit': converted_unit,
                 'date_utc': date_utc,
-                'source': source,
-                'original_data': measurement
+                'source': source
             }
+            if keep_original:
+                cleaned['original_data'] = measurement
+            
+            return cleaned
             
         except Exception as e:
             logger.error(f"Error cleaning measurement: {e}")
@@ -234,86 +438,133 @@ class DataProcessor:
         if not measurements:
             return measurements
         
-        # Filter measurements for the specific parameter
-        param_measurements = [m for m in measurements if m.get('parameter') == parameter]
+        # Filter measurements for the specific parameter, remembering where they came from
+        orig_idx = np.array(
+            [i for i, m in enumerate(measurements) if m.get('parameter') == parameter],
+            dtype=np.intp
+        )
         
-        if len(param_measurements) < 3:
+        if len(orig_idx) < 3:
             return measurements  # Not enough data for outlier detection
         
         # Extract values
-        values = [m['value'] for m in param_measurements]
+        values = np.array([measurements[i]['value'] for i in orig_idx], dtype=float)
         
         # Detect outliers
-        outlier_indices = set()
+        if method == 'iqr':
+            mask = cls._detect_outliers_iqr(values)
+        elif method == 'zscore':
+            mask = cls._detect_outliers_zscore(values)
+        elif method == 'modified_zscore':
+            mask = cls._detect_outliers_modified_zscore(values)
+        else:
+            mask = np.zeros(len(values), dtype=bool)
+        
+        # Map the parameter-level mask back onto the full list and mark outliers
+        is_outlier = np.zeros(len(measurements), dtype=bool)
+        is_outlier[orig_idx[mask]] = True
         
+        return [
+            {**measurement, 'is_outlier': flag}
+            for measurement, flag in zip(measurements, is_outlier.tolist())
+        ]
+
+    @classmethod
+    def detect_outliers_all(cls, measurements: List[Dict[str, Any]],
+                            method: str = 'iqr') -> List[Dict[str, Any]]:
+        """
+        Detect outliers for every parameter in a single pass.
+
+        Equivalent to calling detect_outliers once per parameter, but the
+        per-parameter statistics come from one groupby over the whole batch.
+
+        Args:
+            measurements: List of measurement dictionaries
+            method: Outlier detection method ('iqr', 'zscore', 'modified_zscore')
+
+        Returns:
+            List of measurements with outlier flag
+        """
+        if not measurements:
+            return measurements
+
+        df = pd.DataFrame({
+            'parameter': pd.Categorical([m.get('parameter') for m in measurements]),
+            'value': pd.to_numeric(pd.Series([m.get('value') for m in measurements]), errors='coerce')
+        })
+        value = df['value']
+        grouped = df.groupby('parameter', observed=True)['value']
+
         if method == 'iqr':
-            outlier_indices = cls._detect_outliers_iqr(values)
+            q1 = grouped.transform('quantile', 0.25)
+            q3 = grouped.transform('quantile', 0.75)
+            iqr = q3 - q1
+            is_outlier = (value < q1 - 1.5 * iqr) | (value > q3 + 1.5 * iqr)
         elif method == 'zscore':
-            outlier_indices = cls._detect_outliers_zscore(values)
+            mean = grouped.transform('mean')
+            std = grouped.transform('std', ddof=0)
+            is_outlier = (std > 0) & (((value - mean) / std).abs() > 3.0)
         elif method == 'modified_zscore':
-            outlier_indices = cls._detect_outliers_modified_zscore(values)
-        
-        # Mark outliers
-        result = []
-        for i, measurement in enumerate(measurements):
-            measurement_copy = measurement.copy()
-            if i in outlier_indices:
-                measurement_copy['is_outlier'] = True
-            else:
-                measurement_copy['is_outlier'] = False
-            result.append(measurement_copy)
-        
-        return result
-    
+            median = grouped.transform('median')
+            mad = (value - median).abs().groupby(df['parameter'], observed=True).transform('median')
+            is_outlier = (mad > 0) & ((0.6745 * (value - median) / mad).abs() > 3.5)
+        else:
+            is_outlier = pd.Series(False, index=df.index)
+
+        # Parameters with fewer than 3 measurements are never flagged
+        is_outlier = is_outlier & (grouped.transform('size') >= 3)
+
+        return [
+            {**measurement, 'is_outlier': flag}
+            for measurement, flag in zip(measurements, is_outlier.tolist())
+        ]
+
     @classmethod
-    def _detect_outliers_iqr(cls, values: List[float]) -> set:
+    def _detect_outliers_iqr(cls, values: np.ndarray) -> np.ndarray:
         """Detect outliers using Interquartile Range method."""
+        values = np.asarray(values, dtype=float)
         q1 = np.percentile(values, 25)
         q3 = np.percentile(values, 75)
         iqr = q3 - q1
         lower_bound = q1 - 1.5 * iqr
         upper_bound = q3 + 1.5 * iqr
         
-        outlier_indices = set()
-        for i, value in enumerate(values):
-            if value < lower_bound or value > upper_bound:
-                outlier_indices.add(i)
-        
-        return outlier_indices
+        return (values < lower_bound) | (values > upper_bound)
     
     @classmethod
-    def _detect_outliers_zscore(cls, values: List[float], threshold: float = 3.0) -> set:
+    def _detect_outliers_zscore(cls, values: np.ndarray, threshold: float = 3.0) -> np.ndarray:
         """Detect outliers using Z-score method."""
+        values = np.asarray(values, dtype=float)
         mean = np.mean(values)
         std = np.std(values)
         
         if std == 0:
-            return set()
+            return np.zeros(len(values), dtype=bool)
         
-        outlier_indices = set()
-        for i, value in enumerate(values):
-            z_score = abs((value - mean) / std)
-            if z_score > threshold:
-                outlier_indices.add(i)
+        if ne is not None and values.size >= cls.NUMEXPR_MIN_SIZE:
+            return ne.evaluate('abs((values - mean) / std) > threshold')
         
-        return outlier_indices
+        return np.abs((values - mean) / std) > threshold
     
     @classmethod
-    def _detect_outliers_modified_zscore(cls, values: List[float], threshold: float = 3.5) -> set:
+    def _detect_outliers_modified_zscore(cls, values: np.ndarray, threshold: float = 3.5) -> np.ndarray:
         """Detect outliers using Modified Z-score method."""
+        values = np.asarray(values, dtype=float)
         median = np.median(values)
-        mad = np.median([abs(x - median) for x in values])
+        use_numexpr = ne is not None and values.size >= cls.NUMEXPR_MIN_SIZE
+        
+        if use_numexpr:
+            mad = np.median(ne.evaluate('abs(values - median)'))
+        else:
+            mad = np.median(np.abs(values - median))
         
         if mad == 0:
-            return set()
+            return np.zeros(len(values), dtype=bool)
         
-        outlier_indices = set()
-        for i, value in enumerate(values):
-            modified_z_score = 0.6745 * (value - median) / mad
-            if abs(modified_z_score) > threshold:
-                outlier_indices.add(i)
+        if use_numexpr:
+            return ne.evaluate('abs(0.6745 * (values - median) / mad) > threshold')
         
-        return outlier_indices
+        return np.abs(0.6745 * (values - median) / mad) > threshold
     
     @classmethod
     def aggregate_measurements(cls, measurements: List[Dict[str, Any]], 
@@ -343,23 +594,30 @@ class DataProcessor:
         else:
             return measurements
         
-        # Aggregate values
-        grouped = df.groupby(['city', 'parameter', 'time_key']).agg({
-            'value': 'mean',
-            'unit': 'first',
-            'source': 'first'
-        }).reset_index()
-        
-        # Convert back to list of dictionaries
-        aggregated = []
-        for _, row in grouped.iterrows():
-            aggregated.append({
-                'city': row['city'],
-                'parameter': row['parameter'],
-                'value': float(row['value']),
-                'unit': row['unit'],
-                'date_utc': row['time_key'].to_pydatetime(),
-                'source': row['source']
-            })
+        # Aggregate values; unit and source are fixed per (city, parameter), so
+        # they are joined back from one row per pair instead of reduced per group
+        means = df.groupby(['city', 'parameter', 'time_key'], observed=True, sort=False)['value'].mean().reset_index()
+        meta = df.drop_duplicates(['city', 'parameter'])[['city', 'parameter', 'unit', 'source']]
+        grouped = means.merge(meta, on=['city', 'parameter'], how='left')
+        
+        # Convert back to list of dictionaries, column-wise rather than via iterrows
+        aggregated = [
+            {
+                'city': city,
+                'parameter': parameter,
+                'value': value,
+                'unit': unit,
+                'date_utc': date_utc,
+                'source': source
+            }
+            for city, parameter, value, unit, date_utc, source in zip(
+                grouped['city'].tolist(),
+                grouped['parameter'].tolist(),
+                grouped['value'].astype(float).tolist(),
+                grouped['unit'].tolist(),
+                pd.DatetimeIndex(grouped['time_key']).to_pydatetime(),
+                grouped['source'].tolist()
+            )
+        ]
         
         return aggregated
@@ -1,70 +1,239 @@
 """
 OpenAQ API client for fetching air quality data.
 """
+import asyncio
 import requests
+import httpx
 import logging
+import threading
+import pandas as pd
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-import time
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Union
+from cachetools import TTLCache
+
+from .data_processor import build_measurement_frame, concat_measurement_frames
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; city listings are then decoded in one go
+    ijson = None
 
 logger = logging.getLogger(__name__)
 
+# Map OpenAQ parameter names to standard names
+_OPENAQ_PARAM_MAP = {
+    'pm25': 'PM2.5',
+    'pm2.5': 'PM2.5',
+    'o3': 'O3',
+    'no2': 'NO2'
+}
+
+
+def _decode_json(response: Union[requests.Response, httpx.Response]) -> Any:
+    """Decode a JSON response body, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
 class OpenAQClient:
     """
     Client for interacting with the OpenAQ API.
     """
     
-    def __init__(self, base_url: str = "https://api.openaq.org/v2"):
+    # Seconds to keep cached responses; lookup endpoints change far less often than data
+    CACHE_EXPIRE_AFTER = 300
+    CACHE_URLS_EXPIRE_AFTER = {
+        '*/cities': 86400,
+        '*/parameters': 86400,
+        '*/measurements': 300,
+    }
+    
+    # Records requested per page of /measurements
+    PAGE_SIZE = 1000
+    
+    # City listings larger than this, or of unknown size, are parsed incrementally with ijson
+    STREAM_JSON_MIN_BYTES = 1024 * 1024
+    
+    def __init__(
+        self,
+        base_url: str = "https://api.openaq.org/v2",
+        cache_name: str = "openaq_cache",
+        keep_raw: bool = False
+    ):
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'AirSense/1.0 (Air Quality Forecasting App)'
-        })
+        # Keeping the raw OpenAQ records roughly doubles memory per measurement
+        self.keep_raw = keep_raw
+        self.session = CachedSession(
+            cache_name=cache_name,
+            backend='sqlite',
+            expire_after=self.CACHE_EXPIRE_AFTER,
+            urls_expire_after=self.CACHE_URLS_EXPIRE_AFTER,
+            allowable_methods=('GET',)
+        )
+        self.session.cache.delete(expired=True)
+        
+        # Keep connections alive across concurrent requests and retry transient failures
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET']
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # requests-cache buffers whole bodies, so streamed listings go through a
+        # plain session and their parsed result is cached instead
+        self.stream_session = requests.Session()
+        self.stream_session.mount('https://', adapter)
+        self.stream_session.mount('http://', adapter)
+        self._cities_cache = TTLCache(maxsize=64, ttl=self.CACHE_URLS_EXPIRE_AFTER['*/cities'])
+        self._cities_cache_lock = threading.Lock()
+        
+        headers = {
+            'User-Agent': 'AirSense/1.0 (Air Quality Forecasting App)',
+            'Accept-Encoding': 'gzip, deflate'
+        }
+        self.session.headers.update(headers)
+        self.stream_session.headers.update(headers)
     
     def get_measurements(
         self, 
         city: str, 
         parameters: List[str] = None,
-        limit: int = 10000,
+        limit: Optional[int] = 10000,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> pd.DataFrame:
         """
         Fetch air quality measurements from OpenAQ API.
         
         Args:
             city: City name to fetch data for
             parameters: List of parameters to fetch (PM2.5, O3, NO2)
-            limit: Maximum number of records to fetch
+            limit: Maximum number of records to fetch per parameter (None for all pages)
             date_from: Start date for data (default: 7 days ago)
             date_to: End date for data (default: now)
         
         Returns:
-            List of measurement dictionaries
+            DataFrame of measurements, one row per measurement
+        """
+        parameters, date_from, date_to = self._resolve_query(parameters, date_from, date_to)
+        
+        # Requests are independent and IO-bound, so issue them concurrently
+        # on the shared session; a small pool keeps the API load polite
+        with ThreadPoolExecutor(max_workers=min(4, len(parameters)) or 1) as executor:
+            frames = list(executor.map(
+                lambda parameter: self._fetch_parameter(city, parameter, limit, date_from, date_to),
+                parameters
+            ))
+        
+        all_measurements = concat_measurement_frames(frames)
+        logger.info(f"Total measurements fetched for {city}: {len(all_measurements)}")
+        return all_measurements
+    
+    def iter_measurements(
+        self,
+        city: str,
+        parameters: List[str] = None,
+        limit: Optional[int] = 10000,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream air quality measurements from OpenAQ API one page at a time.
+        
+        Only a single page of results is held in memory at once, which keeps
+        peak memory bounded for dense cities and long date ranges.
+        
+        Args:
+            city: City name to fetch data for
+            parameters: List of parameters to fetch (PM2.5, O3, NO2)
+            limit: Maximum number of records to fetch per parameter (None for all pages)
+            date_from: Start date for data (default: 7 days ago)
+            date_to: End date for data (default: now)
+        
+        Yields:
+            DataFrame of processed measurements for each page
+        """
+        parameters, date_from, date_to = self._resolve_query(parameters, date_from, date_to)
+        
+        for parameter in parameters:
+            yield from self._iter_parameter_pages(city, parameter, limit, date_from, date_to)
+    
+    @staticmethod
+    def _resolve_query(
+        parameters: Optional[List[str]],
+        date_from: Optional[datetime],
+        date_to: Optional[datetime]
+    ) -> Tuple[List[str], datetime, datetime]:
+        """
+        Fill in the default parameters and date range for a measurements query.
         """
         if parameters is None:
             parameters = ["PM2.5", "O3", "NO2"]
         
+        # Round default dates to the hour and day so repeat queries share a URL
+        # and can be served from the HTTP cache
+        now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
         if date_from is None:
-            date_from = datetime.utcnow() - timedelta(days=7)
+            date_from = (now - timedelta(days=7)).replace(hour=0)
         if date_to is None:
-            date_to = datetime.utcnow()
+            date_to = now
         
-        all_measurements = []
+        return parameters, date_from, date_to
+    
+    def _fetch_parameter(
+        self,
+        city: str,
+        parameter: str,
+        limit: Optional[int],
+        date_from: datetime,
+        date_to: datetime
+    ) -> pd.DataFrame:
+        """
+        Fetch and process all pages of measurements for a single parameter.
+        """
+        frames = list(self._iter_parameter_pages(city, parameter, limit, date_from, date_to))
+        processed_measurements = concat_measurement_frames(frames)
+        logger.info(f"Fetched {len(processed_measurements)} {parameter} measurements for {city}")
+        return processed_measurements
+    
+    def _iter_parameter_pages(
+        self,
+        city: str,
+        parameter: str,
+        limit: Optional[int],
+        date_from: datetime,
+        date_to: datetime
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yield processed measurement frames for a single parameter, page by page.
         
-        for parameter in parameters:
-            try:
-                logger.info(f"Fetching {parameter} data for {city}")
-                
-                # Prepare API parameters
-                params = {
-                    'city': city,
-                    'parameter': parameter,
-                    'limit': limit,
-                    'date_from': date_from.isoformat(),
-                    'date_to': date_to.isoformat(),
-                    'format': 'json'
-                }
+        Paging stops once a short page is returned or `limit` records have been
+        fetched. Errors are logged and end the stream for this parameter.
+        """
+        page = 1
+        fetched = 0
+        
+        try:
+            logger.info(f"Fetching {parameter} data for {city}")
+            
+            # The page size stays fixed so OpenAQ's page offsets line up across requests
+            page_size = self._page_size(limit)
+            while limit is None or fetched < limit:
+                params = self._page_params(city, parameter, page_size, page, date_from, date_to)
                 
                 # Make API request
                 response = self.session.get(
@@ -74,107 +243,225 @@ class OpenAQClient:
                 )
                 response.raise_for_status()
                 
-                data = response.json()
+                data = _decode_json(response)
+                measurements = data.get('results') or []
+                if not measurements:
+                    break
                 
-                if 'results' in data:
-                    measurements = data['results']
-                    logger.info(f"Fetched {len(measurements)} {parameter} measurements for {city}")
-                    
-                    # Process and normalize measurements
-                    for measurement in measurements:
-                        processed = self._process_measurement(measurement, city, parameter)
-                        if processed:
-                            all_measurements.append(processed)
+                short_page = len(measurements) < page_size
+                if limit is not None:
+                    measurements = measurements[:limit - fetched]
+                fetched += len(measurements)
+                logger.debug(f"Fetched page {page} of {parameter} data for {city} ({len(measurements)} records)")
                 
-                # Rate limiting - be respectful to the API
-                time.sleep(0.1)
+                # Process and normalize this page before requesting the next one
+                yield self._process_results(measurements, city, parameter)
                 
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching {parameter} data for {city}: {e}")
-                continue
-            except Exception as e:
-                logger.error(f"Unexpected error fetching {parameter} data for {city}: {e}")
-                continue
+                if short_page:
+                    break
+                page += 1
+            
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching {parameter} data for {city} (page {page}): {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error fetching {parameter} data for {city} (page {page}): {e}")
+    
+    def _page_size(self, limit: Optional[int]) -> int:
+        """
+        Number of records to request per page; the last page is trimmed to `limit`.
+        """
+        return self.PAGE_SIZE if limit is None else min(self.PAGE_SIZE, limit)
+    
+    @staticmethod
+    def _page_params(
+        city: str,
+        parameter: str,
+        page_size: int,
+        page: int,
+        date_from: datetime,
+        date_to: datetime
+    ) -> Dict[str, Any]:
+        """
+        Prepare API parameters for one page of /measurements.
+        """
+        return {
+            'city': city,
+            'parameter': parameter,
+            'limit': page_size,
+            'page': page,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'format': 'json'
+        }
+    
+    async def aget_measurements(
+        self,
+        city: str,
+        parameters: List[str] = None,
+        limit: Optional[int] = 10000,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        Fetch air quality measurements from OpenAQ API without blocking the event loop.
         
+        All parameters are fetched concurrently over a single HTTP/2 client, so
+        callers already running in an event loop (e.g. FastAPI handlers) can
+        overlap many requests without a thread per request. Responses bypass
+        the on-disk cache used by get_measurements.
+        
+        Args:
+            city: City name to fetch data for
+            parameters: List of parameters to fetch (PM2.5, O3, NO2)
+            limit: Maximum number of records to fetch per parameter (None for all pages)
+            date_from: Start date for data (default: 7 days ago)
+            date_to: End date for data (default: now)
+        
+        Returns:
+            DataFrame of measurements, one row per measurement
+        """
+        parameters, date_from, date_to = self._resolve_query(parameters, date_from, date_to)
+        
+        async with httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=32),
+            headers={'User-Agent': self.session.headers['User-Agent']},
+            timeout=30
+        ) as client:
+            frames = await asyncio.gather(*[
+                self._afetch_parameter(client, city, parameter, limit, date_from, date_to)
+                for parameter in parameters
+            ])
+        
+        all_measurements = concat_measurement_frames(frames)
         logger.info(f"Total measurements fetched for {city}: {len(all_measurements)}")
         return all_measurements
     
-    def _process_measurement(self, measurement: Dict[str, Any], city: str, parameter: str) -> Optional[Dict[str, Any]]:
+    async def _afetch_parameter(
+        self,
+        client: httpx.AsyncClient,
+        city: str,
+        parameter: str,
+        limit: Optional[int],
+        date_from: datetime,
+        date_to: datetime
+    ) -> pd.DataFrame:
         """
-        Process and normalize a single measurement from OpenAQ API.
+        Fetch and process all pages of measurements for a single parameter asynchronously.
         """
+        frames = []
+        page = 1
+        fetched = 0
+        
         try:
-            # Extract relevant fields
-            value = measurement.get('value')
-            unit = measurement.get('unit')
-            date_utc = measurement.get('date', {}).get('utc')
-            
-            # Validate required fields
-            if value is None or unit is None or date_utc is None:
-                return None
-            
-            # Convert value to float
-            try:
-                value = float(value)
-            except (ValueError, TypeError):
-                return None
-            
-            # Parse UTC date
-            try:
-                date_utc = datetime.fromisoformat(date_utc.replace('Z', '+00:00'))
-            except (ValueError, AttributeError):
-                return None
+            logger.info(f"Fetching {parameter} data for {city}")
             
-            # Normalize parameter names
-            param_mapping = {
-                'pm25': 'PM2.5',
-                'pm2.5': 'PM2.5',
-                'o3': 'O3',
-                'no2': 'NO2'
-            }
-            normalized_param = param_mapping.get(parameter.lower(), parameter.upper())
-            
-            return {
-                'city': city,
-                'parameter': normalized_param,
-                'value': value,
-                'unit': unit,
-                'date_utc': date_utc,
-                'source': 'openaq',
-                'raw_data': measurement  # Store raw data for debugging
-            }
+            page_size = self._page_size(limit)
+            while limit is None or fetched < limit:
+                params = self._page_params(city, parameter, page_size, page, date_from, date_to)
+                
+                response = await client.get(f"{self.base_url}/measurements", params=params)
+                response.raise_for_status()
+                
+                data = _decode_json(response)
+                measurements = data.get('results') or []
+                if not measurements:
+                    break
+                
+                short_page = len(measurements) < page_size
+                if limit is not None:
+                    measurements = measurements[:limit - fetched]
+                fetched += len(measurements)
+                frames.append(self._process_results(measurements, city, parameter))
+                
+                if short_page:
+                    break
+                page += 1
             
+        except httpx.HTTPError as e:
+            logger.error(f"Error fetching {parameter} data for {city} (page {page}): {e}")
         except Exception as e:
-            logger.error(f"Error processing measurement: {e}")
-            return None
+            logger.error(f"Unexpected error fetching {parameter} data for {city} (page {page}): {e}")
+        
+        processed_measurements = concat_measurement_frames(frames)
+        logger.info(f"Fetched {len(processed_measurements)} {parameter} measurements for {city}")
+        return processed_measurements
+    
+    def _process_results(self, results: List[Dict[str, Any]], city: str, parameter: str) -> pd.DataFrame:
+        """
+        Process and normalize a list of OpenAQ results into a measurement frame.
+        Records without a numeric value, a unit or a parseable UTC date are dropped.
+        """
+        # Extract relevant fields column by column
+        values = [result.get('value') for result in results]
+        units = [result.get('unit') for result in results]
+        dates = [
+            date.get('utc') if isinstance(date, dict) else None
+            for date in (result.get('date') for result in results)
+        ]
+        
+        # Convert values to float and parse UTC dates; failures become NaN/NaT
+        values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+        units = pd.Series(units, dtype=object)
+        dates = pd.to_datetime(pd.Series(dates, dtype=object), errors='coerce', utc=True, format='ISO8601')
+        
+        # Validate required fields
+        valid = values.notna() & units.notna() & dates.notna()
+        
+        # Normalize parameter names
+        normalized_param = _OPENAQ_PARAM_MAP.get(parameter.lower(), parameter.upper())
+        
+        frame = build_measurement_frame(
+            city,
+            normalized_param,
+            values[valid].array,
+            units[valid].array,
+            dates[valid].array,
+            'openaq'
+        )
+        if self.keep_raw:
+            frame['raw_data'] = pd.Series(results, dtype=object)[valid].array  # Store raw data for debugging
+        return frame
     
     def get_available_cities(self, country: str = "US") -> List[str]:
         """
         Get list of available cities in a country.
+        
+        Large listings are parsed incrementally with ijson when it is installed,
+        so the full JSON document is never built. Results are cached per country.
         """
+        with self._cities_cache_lock:
+            cached = self._cities_cache.get(country)
+        if cached is not None:
+            return list(cached)
+        
         try:
             params = {
                 'country': country,
                 'limit': 1000
             }
             
-            response = self.session.get(
+            with self.stream_session.get(
                 f"{self.base_url}/cities",
                 params=params,
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            cities = []
-            
-            if 'results' in data:
-                for city_data in data['results']:
-                    city_name = city_data.get('city')
-                    if city_name:
-                        cities.append(city_name)
+                timeout=30,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                
+                content_length = int(response.headers.get('Content-Length') or 0)
+                if ijson is not None and (content_length == 0 or content_length > self.STREAM_JSON_MIN_BYTES):
+                    response.raw.decode_content = True
+                    city_names = ijson.items(response.raw, 'results.item.city')
+                else:
+                    data = _decode_json(response)
+                    city_names = (city_data.get('city') for city_data in data.get('results', []))
+                
+                cities = sorted(city_name for city_name in city_names if city_name)
             
-            return sorted(cities)
+            with self._cities_cache_lock:
+                self._cities_cache[country] = cities
+            return list(cities)
             
         except Exception as e:
             logger.error(f"Error fetching available cities: {e}")
@@ -188,7 +475,7 @@ class OpenAQClient:
             response = self.session.get(f"{self.base_url}/parameters", timeout=30)
             response.raise_for_status()
             
-            data = response.json()
+            data = _decode_json(response)
             return data
             
         except Exception as e:
@@ -2,21 +2,916 @@
 NASA TEMPO data client using earthaccess for AppEEARS API.
 """
 import os
+import json
+import hashlib
+import importlib.util
 import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from itertools import repeat
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
 import earthaccess
+from earthaccess.results import DataGranule
+import dask
+import h5py
 import xarray as xr
 import pandas as pd
 import numpy as np
+from cachetools import TTLCache
+
+try:
+    import diskcache
+except ImportError:  # diskcache is optional; searches are then cached in memory only
+    diskcache = None
+
+from .data_processor import build_measurement_frame, concat_measurement_frames
 
 logger = logging.getLogger(__name__)
 
+# Granule reader backend: 'xarray' (default), 'h5py' for direct chunked reads,
+# or 'kerchunk' for a Zarr view over the HDF5 chunks
+_TEMPO_READER = os.getenv('TEMPO_READER', 'xarray').lower()
+
+if _TEMPO_READER == 'kerchunk':
+    try:
+        from kerchunk.hdf import SingleHdf5ToZarr
+    except ImportError:
+        logger.warning("TEMPO_READER is kerchunk but kerchunk is not installed; using xarray")
+        _TEMPO_READER = 'xarray'
+
+# Optional Numba kernels, enabled with NASA_USE_NUMBA=1
+_USE_NUMBA = os.getenv('NASA_USE_NUMBA') == '1'
+if _USE_NUMBA:
+    try:
+        from numba import njit, prange
+    except ImportError:
+        logger.warning("NASA_USE_NUMBA is set but numba is not installed; using NumPy")
+        _USE_NUMBA = False
+
+# Map TEMPO parameters to standard names
+_TEMPO_PARAM_MAP = {
+    'NO2': 'NO2',
+    'O3': 'O3',
+    'HCHO': 'HCHO',
+    'H2CO': 'HCHO'  # Map H2CO to HCHO
+}
+
+# Standard parameter names, used as the categories of the parameter column
+_TEMPO_PARAMETERS = np.unique(list(_TEMPO_PARAM_MAP.values()))
+
+# Column density units reported by TEMPO
+_TEMPO_UNIT = 'mol/m²'
+
+# Read-ahead block size when streaming granules over HTTPS
+_STREAM_BLOCK_SIZE = 8 * 1024 * 1024
+
+# On-disk cache of CMR search results, and how long (seconds) entries are kept
+_CMR_CACHE_DIR = 'data/cache/cmr/'
+_CMR_CACHE_TTL = 3600
+
+# Concurrent granule downloads, and retries with exponential backoff (seconds) per granule
+_DOWNLOAD_WORKERS = 16
+_DOWNLOAD_RETRIES = 3
+_DOWNLOAD_BACKOFF = 1.0
+
+# Granule workers are spawned rather than forked: the parent may already run
+# dask or request threads, and forking those can deadlock the children
+_POOL_CONTEXT = multiprocessing.get_context('spawn')
+
+# Simple coordinate-based city mapping for North America
+_CITY_MAPPING = [
+    (40.7128, -74.0060, "New York"),
+    (34.0522, -118.2437, "Los Angeles"),
+    (41.8781, -87.6298, "Chicago"),
+    (29.7604, -95.3698, "Houston"),
+    (33.4484, -112.0740, "Phoenix"),
+    (39.9526, -75.1652, "Philadelphia"),
+    (32.7767, -96.7970, "Dallas"),
+    (37.7749, -122.4194, "San Francisco"),
+    (39.7392, -104.9903, "Denver"),
+    (47.6062, -122.3321, "Seattle"),
+    (25.7617, -80.1918, "Miami"),
+    (42.3601, -71.0589, "Boston"),
+    (43.6532, -79.3832, "Toronto"),
+    (45.5017, -73.5673, "Montreal"),
+    (49.2827, -123.1207, "Vancouver"),
+]
+
+
+# City lookup table, built once at import and split into contiguous per-field
+# arrays for the NumPy/Numba kernels
+_CITIES = np.array(_CITY_MAPPING, dtype=[('lat', 'f4'), ('lon', 'f4'), ('name', 'U32')])
+_CITY_LATS = np.ascontiguousarray(_CITIES['lat'])
+_CITY_LONS = np.ascontiguousarray(_CITIES['lon'])
+_CITY_NAMES = np.ascontiguousarray(_CITIES['name'])
+
+# Radians feed the haversine distance; kept in float64 for distance accuracy
+_CITY_LAT_R = np.radians(_CITY_LATS.astype(np.float64))
+_CITY_LON_R = np.radians(_CITY_LONS.astype(np.float64))
+_CITY_COS_LAT = np.cos(_CITY_LAT_R)
+
+# Points per slice when computing nearest cities with NumPy
+_NEAREST_CITY_BATCH = 1 << 16
+
+# Only pixels within this great-circle distance of a city are kept
+_CATCHMENT_KM = float(os.getenv('TEMPO_CATCHMENT_KM', '50'))
+_EARTH_RADIUS_KM = 6371.0
+_KM_PER_DEGREE = np.pi * _EARTH_RADIUS_KM / 180
+
+# Haversine term at the catchment radius, so distances compare without the arcsin
+_CATCHMENT_HAVERSINE = np.sin(min(_CATCHMENT_KM / _EARTH_RADIUS_KM, np.pi) / 2) ** 2
+
+# Bounding box [west, south, east, north] enclosing every city catchment
+_CATCHMENT_LAT_DEG = _CATCHMENT_KM / _KM_PER_DEGREE
+_CATCHMENT_LON_DEG = _CATCHMENT_LAT_DEG / np.cos(np.radians(np.minimum(np.abs(_CITY_LATS) + _CATCHMENT_LAT_DEG, 89.0)))
+_CATCHMENT_BBOX = (
+    float(np.min(_CITY_LONS - _CATCHMENT_LON_DEG)),
+    float(np.min(_CITY_LATS - _CATCHMENT_LAT_DEG)),
+    float(np.max(_CITY_LONS + _CATCHMENT_LON_DEG)),
+    float(np.max(_CITY_LATS + _CATCHMENT_LAT_DEG)),
+)
+
+
+if _USE_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _nearest_city_kernel(lats, lons, city_lat_r, city_lon_r, city_cos_lat):
+        """
+        Nearest city by haversine for each point, streaming over the points
+        without materializing the (points, cities) distance matrix.
+        """
+        n = lats.size
+        out_idx = np.empty(n, dtype=np.int64)
+        out_a = np.empty(n, dtype=np.float64)
+        
+        for i in prange(n):
+            lat_r = np.radians(lats[i])
+            lon_r = np.radians(lons[i])
+            cos_lat = np.cos(lat_r)
+            best = 0
+            best_a = np.inf
+            for c in range(city_lat_r.size):
+                a = (np.sin((lat_r - city_lat_r[c]) / 2) ** 2
+                     + cos_lat * city_cos_lat[c] * np.sin((lon_r - city_lon_r[c]) / 2) ** 2)
+                if a < best_a:
+                    best_a = a
+                    best = c
+            out_idx[i] = best
+            out_a[i] = best_a
+        
+        return out_idx, out_a
+
+
+def _nearest_city(lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Closest city for arrays of latitude and longitude coordinates.
+    
+    Returns:
+        Tuple of (index into _CITY_NAMES, haversine term to that city)
+    """
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    
+    if _USE_NUMBA:
+        return _nearest_city_kernel(lats, lons, _CITY_LAT_R, _CITY_LON_R, _CITY_COS_LAT)
+    
+    idx = np.empty(lats.size, dtype=np.int64)
+    best_a = np.empty(lats.size, dtype=np.float64)
+    
+    # Work in slices so the (points, cities) temporaries stay small
+    for start in range(0, lats.size, _NEAREST_CITY_BATCH):
+        stop = min(start + _NEAREST_CITY_BATCH, lats.size)
+        lat_r = np.radians(lats[start:stop])
+        lon_r = np.radians(lons[start:stop])
+        
+        # Haversine term for every (pixel, city) pair; it is monotonic in great-circle
+        # distance, so the argmin picks the nearest city without the arcsin
+        dlat = lat_r[:, None] - _CITY_LAT_R[None, :]
+        dlon = lon_r[:, None] - _CITY_LON_R[None, :]
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat_r)[:, None] * _CITY_COS_LAT[None, :] * np.sin(dlon / 2) ** 2
+        
+        batch_idx = np.argmin(a, axis=1)
+        idx[start:stop] = batch_idx
+        best_a[start:stop] = a[np.arange(batch_idx.size), batch_idx]
+    
+    return idx, best_a
+
+
+def _nearest_city_index(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Index into _CITY_NAMES of the closest city for arrays of latitude and longitude coordinates.
+    """
+    return _nearest_city(lats, lons)[0]
+
+
+def _assign_cities(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Determine the closest city for arrays of latitude and longitude coordinates.
+    This is a simplified implementation - in production, you'd use a proper geocoding service.
+    """
+    return _CITY_NAMES[_nearest_city_index(lats, lons)]
+
+
+def _city_grid(lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Nearest-city index for every pixel of a 2-D coordinate grid, and a mask of
+    pixels that fall within a city catchment. Computed once per file and shared
+    by all parameters and time blocks.
+    
+    Pixels outside the bounding box of all catchments are rejected with simple
+    comparisons before any distance math.
+    """
+    flat_lats = lats.ravel()
+    flat_lons = lons.ravel()
+    
+    west, south, east, north = _CATCHMENT_BBOX
+    candidates = np.flatnonzero(
+        (flat_lats >= south) & (flat_lats <= north) & (flat_lons >= west) & (flat_lons <= east)
+    )
+    
+    city_idx = np.zeros(flat_lats.size, dtype=np.int64)
+    in_catchment = np.zeros(flat_lats.size, dtype=bool)
+    if candidates.size:
+        nearest, a = _nearest_city(flat_lats[candidates], flat_lons[candidates])
+        city_idx[candidates] = nearest
+        in_catchment[candidates] = a <= _CATCHMENT_HAVERSINE
+    
+    return city_idx.reshape(lats.shape), in_catchment.reshape(lats.shape)
+
+
+if _USE_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _extract_tempo_kernel(block_data, valid_mask, lats, lons, city_grid):
+        """
+        Gather valid pixels of a (parameter, lat, lon, time) block together with their city.
+        Output order matches boolean-mask indexing of the block.
+        """
+        np_, ni, nj, nk = block_data.shape
+        rows = np_ * ni
+        
+        # Count valid pixels per (parameter, lat) row so each row knows where to write its output
+        counts = np.zeros(rows, dtype=np.int64)
+        for r in prange(rows):
+            p = r // ni
+            i = r % ni
+            count = 0
+            for j in range(nj):
+                for k in range(nk):
+                    if valid_mask[p, i, j, k]:
+                        count += 1
+            counts[r] = count
+        
+        offsets = np.zeros(rows + 1, dtype=np.int64)
+        for r in range(rows):
+            offsets[r + 1] = offsets[r] + counts[r]
+        
+        n = offsets[rows]
+        out_param = np.empty(n, dtype=np.int64)
+        out_vals = np.empty(n, dtype=np.float32)
+        out_lat = np.empty(n, dtype=np.float32)
+        out_lon = np.empty(n, dtype=np.float32)
+        out_time = np.empty(n, dtype=np.int64)
+        out_city = np.empty(n, dtype=np.int64)
+        
+        for r in prange(rows):
+            p = r // ni
+            i = r % ni
+            pos = offsets[r]
+            for j in range(nj):
+                for k in range(nk):
+                    if not valid_mask[p, i, j, k]:
+                        continue
+                    out_param[pos] = p
+                    out_vals[pos] = block_data[p, i, j, k]
+                    out_lat[pos] = lats[i, j]
+                    out_lon[pos] = lons[i, j]
+                    out_time[pos] = k
+                    out_city[pos] = city_grid[i, j]
+                    pos += 1
+        
+        return out_param, out_vals, out_lat, out_lon, out_time, out_city
+
+
+def _extract_block(block_data: np.ndarray, valid_mask: np.ndarray,
+                   lats: np.ndarray, lons: np.ndarray, times: np.ndarray,
+                   city_grid: np.ndarray):
+    """
+    Extract valid pixels from a stacked (parameter, lat, lon, time) block.
+    
+    Returns:
+        Tuple of flat (parameter indices, float32 values, float32 latitudes,
+        float32 longitudes, times, city indices) arrays
+    """
+    if _USE_NUMBA:
+        param_idx, val_flat, lat_flat, lon_flat, time_idx, city_idx = _extract_tempo_kernel(
+            np.ascontiguousarray(block_data, dtype=np.float32),
+            np.ascontiguousarray(valid_mask),
+            np.ascontiguousarray(lats, dtype=np.float32),
+            np.ascontiguousarray(lons, dtype=np.float32),
+            np.ascontiguousarray(city_grid, dtype=np.int64)
+        )
+        return param_idx, val_flat, lat_flat, lon_flat, times[time_idx], city_idx
+    
+    # Gather valid pixels of all parameters in one pass; coordinates and cities
+    # are read straight from the 2-D grids instead of being recomputed per pixel
+    idx = np.flatnonzero(np.ascontiguousarray(valid_mask).reshape(-1))
+    pp, ii, jj, kk = np.unravel_index(idx, block_data.shape)
+    lat_flat = lats[ii, jj].astype(np.float32, copy=False)
+    lon_flat = lons[ii, jj].astype(np.float32, copy=False)
+    time_flat = times[kk]
+    val_flat = np.ascontiguousarray(block_data).reshape(-1)[idx].astype(np.float32, copy=False)
+    city_idx = city_grid[ii, jj]
+    
+    return pp, val_flat, lat_flat, lon_flat, time_flat, city_idx
+
+
+def _time_blocks(variable: xr.DataArray):
+    """
+    Yield (start, stop) index ranges along the time dimension, one per dask chunk.
+    Variables that are not chunked are treated as a single block.
+    """
+    sizes = variable.chunksizes.get('time') or (variable.sizes['time'],)
+    start = 0
+    for size in sizes:
+        yield start, start + size
+        start += size
+
+
+def _decode_values(variable: Any, data: np.ndarray):
+    """
+    Apply fill-value masking and scaling to raw data read with mask_and_scale=False.
+    `variable` is any object with netCDF attrs (xarray variable or h5py dataset).
+    Values are returned as float32, matching the precision TEMPO stores.
+    
+    Returns:
+        Tuple of (values, valid_mask)
+    """
+    valid_mask = np.isfinite(data)
+    for attr in ('_FillValue', 'missing_value'):
+        fill_value = variable.attrs.get(attr)
+        if fill_value is not None:
+            valid_mask &= data != fill_value
+    
+    data = data.astype(np.float32, copy=False)
+    scale_factor = variable.attrs.get('scale_factor')
+    add_offset = variable.attrs.get('add_offset')
+    if scale_factor is not None:
+        data = data * np.asarray(scale_factor, dtype=np.float32)
+    if add_offset is not None:
+        data = data + np.asarray(add_offset, dtype=np.float32)
+    
+    return data, valid_mask
+
+
+@lru_cache(maxsize=1 << 20)
+def _cached_city(lat: float, lon: float) -> str:
+    """
+    Nearest city for an already rounded latitude/longitude pair.
+    """
+    return str(_assign_cities(np.array([lat]), np.array([lon]))[0])
+
+
+def _get_city_from_coords(lat: float, lon: float) -> str:
+    """
+    Determine city name from a single latitude/longitude pair.
+    Results are cached on coordinates rounded to 3 decimals (about 100 m),
+    so repeated lookups stay cheap if a real geocoder is swapped in.
+    """
+    return _cached_city(round(float(lat), 3), round(float(lon), 3))
+
+
+def prewarm_geocode(city_list: Optional[List[Tuple[float, float, str]]] = None) -> None:
+    """
+    Seed the reverse-geocode cache with known city locations.
+    
+    Args:
+        city_list: (latitude, longitude, name) tuples; defaults to the built-in city mapping
+    """
+    if city_list is None:
+        city_list = _CITY_MAPPING
+    
+    for city_lat, city_lon, _ in city_list:
+        _get_city_from_coords(city_lat, city_lon)
+
+
+def _granule_bbox(granule: Dict[str, Any]) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Bounding box (west, south, east, north) of a granule's UMM spatial footprint.
+    Returns None when the footprint is missing or not understood.
+    """
+    try:
+        geometry = granule['umm']['SpatialExtent']['HorizontalSpatialDomain']['Geometry']
+    except (KeyError, TypeError):
+        return None
+    
+    lons = []
+    lats = []
+    for rectangle in geometry.get('BoundingRectangles', []):
+        lons.extend([rectangle['WestBoundingCoordinate'], rectangle['EastBoundingCoordinate']])
+        lats.extend([rectangle['SouthBoundingCoordinate'], rectangle['NorthBoundingCoordinate']])
+    for polygon in geometry.get('GPolygons', []):
+        for point in polygon.get('Boundary', {}).get('Points', []):
+            lons.append(point['Longitude'])
+            lats.append(point['Latitude'])
+    
+    if not lons:
+        return None
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def _granule_near_cities(granule: Dict[str, Any]) -> bool:
+    """
+    Whether a granule's footprint overlaps the bounding box of any city catchment.
+    Granules without a usable footprint are kept.
+    """
+    try:
+        bbox = _granule_bbox(granule)
+    except (KeyError, TypeError, ValueError):
+        bbox = None
+    if bbox is None:
+        return True
+    
+    west, south, east, north = bbox
+    overlaps = (
+        (_CITY_LONS - _CATCHMENT_LON_DEG <= east) & (_CITY_LONS + _CATCHMENT_LON_DEG >= west)
+        & (_CITY_LATS - _CATCHMENT_LAT_DEG <= north) & (_CITY_LATS + _CATCHMENT_LAT_DEG >= south)
+    )
+    return bool(np.any(overlaps))
+
+
+def _granule_cache_path(granule: Dict[str, Any], download_path: str) -> Optional[Path]:
+    """
+    Stable cache filename for a granule, derived from its CMR concept ID.
+    Returns None when the granule has no concept ID.
+    """
+    try:
+        concept_id = granule['meta']['concept-id']
+    except (KeyError, TypeError):
+        return None
+    
+    cache_key = hashlib.sha1(concept_id.encode()).hexdigest()
+    return Path(download_path) / f"{cache_key}.nc"
+
+
+def _store_downloaded_granules(missing: List[Tuple[Any, Optional[Path]]], downloaded: List[str]) -> List[str]:
+    """
+    Move freshly downloaded files to their cache filenames.
+    
+    Args:
+        missing: (granule, cache path) pairs that were downloaded
+        downloaded: Local file paths returned by earthaccess.download
+    
+    Returns:
+        Local paths of the downloaded files after caching
+    """
+    by_name = {os.path.basename(path): str(path) for path in downloaded}
+    stored = []
+    
+    for granule, target in missing:
+        try:
+            names = [os.path.basename(link) for link in granule.data_links()]
+        except AttributeError:
+            names = []
+        
+        source = next((by_name.pop(name) for name in names if name in by_name), None)
+        if source is None:
+            continue
+        
+        if target is not None:
+            os.replace(source, target)
+            source = str(target)
+        stored.append(source)
+    
+    # Keep any files that could not be matched back to a granule
+    stored.extend(by_name.values())
+    return stored
+
+
+def _download_granule(granule: Dict[str, Any], target: Optional[Path], download_path: str) -> List[str]:
+    """
+    Download a single granule into the cache, retrying with exponential backoff.
+    
+    Returns:
+        Local paths of the granule's files after caching
+    """
+    for attempt in range(_DOWNLOAD_RETRIES):
+        try:
+            downloaded = earthaccess.download([granule], download_path, threads=1)
+            if downloaded:
+                return _store_downloaded_granules([(granule, target)], downloaded)
+            error = "no files returned"
+        except Exception as e:
+            error = e
+        
+        if attempt < _DOWNLOAD_RETRIES - 1:
+            delay = _DOWNLOAD_BACKOFF * 2 ** attempt
+            logger.warning(f"Download of TEMPO granule failed ({error}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+    
+    logger.error(f"Giving up on TEMPO granule after {_DOWNLOAD_RETRIES} attempts: {error}")
+    return []
+
+
+def _download_granules(missing: List[Tuple[Any, Optional[Path]]], download_path: str) -> List[str]:
+    """
+    Download granules concurrently, one granule per task.
+    Granules that still fail after retrying are skipped.
+    
+    Args:
+        missing: (granule, cache path) pairs to download
+        download_path: Local path to save downloaded files
+    
+    Returns:
+        Local paths of the downloaded files, in granule order
+    """
+    with ThreadPoolExecutor(max_workers=min(_DOWNLOAD_WORKERS, len(missing)) or 1) as executor:
+        results = executor.map(
+            lambda item: _download_granule(item[0], item[1], download_path),
+            missing
+        )
+        return [path for paths in results for path in paths]
+
+
+def _extract_measurements(file_path: str, present_params: List[str], lats: np.ndarray,
+                          lons: np.ndarray, times: pd.DatetimeIndex, blocks) -> List[pd.DataFrame]:
+    """
+    Turn the decoded time blocks of one file into measurement frames.
+    Shared by every reader backend.
+    
+    Args:
+        file_path: Source file, used in log messages
+        present_params: Parameters present in the file, in block order
+        lats: 2-D latitude grid
+        lons: 2-D longitude grid
+        times: Decoded times along the time axis
+        blocks: Iterable of (start, stop, [(values, valid_mask) per parameter])
+    
+    Returns:
+        List of measurement frames, one per time block with valid pixels
+    """
+    frames = []
+    
+    if not present_params:
+        return frames
+    
+    # Map TEMPO parameters to standard names. City and parameter columns are
+    # categoricals over fixed vocabularies, so frames from every block and
+    # file concatenate without falling back to per-row strings.
+    mapped_params = np.array([_TEMPO_PARAM_MAP.get(param, param) for param in present_params])
+    param_names = np.union1d(_TEMPO_PARAMETERS, mapped_params)
+    param_codes = np.searchsorted(param_names, mapped_params)
+    
+    # Cities depend only on the pixel grid, so assign them once per file and
+    # drop pixels that are not near any city
+    city_grid, in_catchment = _city_grid(lats, lons)
+    if not np.any(in_catchment):
+        logger.info(f"No pixels within {_CATCHMENT_KM:g} km of a city in {file_path}")
+        return frames
+    
+    # Extract one time block of every parameter at a time
+    invalid_pixels = 0
+    for start, stop, decoded in blocks:
+        block_data = np.stack([param_data for param_data, _ in decoded])
+        valid_mask = np.stack([param_mask for _, param_mask in decoded])
+        valid_mask &= in_catchment[None, :, :, None]
+        del decoded
+        
+        if not np.any(valid_mask):
+            continue
+        
+        param_idx, val_flat, lat_flat, lon_flat, time_flat, city_idx = _extract_block(
+            block_data, valid_mask, lats, lons, times[start:stop], city_grid
+        )
+        
+        # Scaling can overflow and coordinates can hold fill values; drop those
+        # pixels in one pass and report them once per file
+        ok = np.isfinite(val_flat) & np.isfinite(lat_flat) & np.isfinite(lon_flat)
+        if not ok.all():
+            invalid_pixels += int(ok.size - np.count_nonzero(ok))
+            param_idx, val_flat, lat_flat, lon_flat, time_flat, city_idx = (
+                param_idx[ok], val_flat[ok], lat_flat[ok], lon_flat[ok], time_flat[ok], city_idx[ok]
+            )
+        
+        frame = build_measurement_frame(
+            pd.Categorical.from_codes(city_idx, _CITY_NAMES),
+            pd.Categorical.from_codes(param_codes[param_idx], param_names),
+            val_flat,
+            _TEMPO_UNIT,
+            time_flat,
+            'tempo',
+            lat_flat,
+            lon_flat
+        )
+        frames.append(frame)
+    
+    if invalid_pixels:
+        logger.warning(f"Dropped {invalid_pixels} invalid pixels from {file_path}")
+    
+    return frames
+
+
+def _xarray_blocks(variables: List[xr.DataArray]):
+    """
+    Yield (start, stop, decoded) time blocks, one per dask chunk of the first variable.
+    """
+    for start, stop in _time_blocks(variables[0]):
+        # Get valid data (finite and not the fill value)
+        yield start, stop, [
+            _decode_values(variable, variable.isel(time=slice(start, stop)).values)
+            for variable in variables
+        ]
+
+
+def _read_tempo_dataset(ds: xr.Dataset, file_path: str, parameters: List[str]) -> List[pd.DataFrame]:
+    """
+    Extract measurement frames from a lazily opened TEMPO dataset.
+    """
+    # Keep only the requested variables; the rest are never read from disk
+    present_params = []
+    for param in parameters:
+        if param in ds.variables:
+            present_params.append(param)
+        else:
+            logger.warning(f"Parameter {param} not found in file {file_path}")
+    ds = ds[present_params + [name for name in ('latitude', 'longitude') if name in ds.data_vars]]
+    
+    # Blocks are read one at a time, so dask's thread pool adds nothing here;
+    # the synchronous scheduler also leaves no threads behind in the caller
+    with dask.config.set(scheduler='synchronous'):
+        # Get coordinates
+        lats = ds.latitude.values
+        lons = ds.longitude.values
+        # Decoded times are datetime64[ns]; convert the T unique values once
+        # and gather from the index per pixel instead of re-parsing
+        times = pd.to_datetime(ds.time.values)
+        
+        variables = [ds[param] for param in present_params]
+        return _extract_measurements(
+            file_path, present_params, lats, lons, times, _xarray_blocks(variables)
+        )
+
+
+def _read_tempo_file_xarray(file_path: str, parameters: List[str], source: Any = None) -> List[pd.DataFrame]:
+    """
+    Read a TEMPO file through xarray and dask and extract its measurement frames.
+    `source` may be an open file-like object to read instead of `file_path`.
+    """
+    # Open NetCDF file lazily with dask chunks matching the on-disk chunking,
+    # so each block read maps onto whole HDF5 chunks. Masking and scaling
+    # are applied by hand, so xarray skips those decode passes.
+    with xr.open_dataset(
+        file_path if source is None else source,
+        engine='h5netcdf',
+        chunks={},
+        decode_times=True,
+        mask_and_scale=False,
+        decode_coords=False,
+        concat_characters=False,
+        cache=False
+    ) as ds:
+        return _read_tempo_dataset(ds, file_path, parameters)
+
+
+def _kerchunk_refs(file_path: str) -> Dict[str, Any]:
+    """
+    Load the kerchunk reference set for a file, generating it on first use.
+    References are kept in a .refs directory next to the file and rebuilt
+    when the file is newer than its references.
+    """
+    source = Path(file_path)
+    refs_path = source.parent / '.refs' / f"{source.stem}.json"
+    
+    if refs_path.exists() and refs_path.stat().st_mtime >= source.stat().st_mtime:
+        with open(refs_path) as f:
+            return json.load(f)
+    
+    refs = SingleHdf5ToZarr(str(source), inline_threshold=300).translate()
+    
+    # Write atomically so concurrent workers never read a partial file
+    refs_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = refs_path.with_name(f"{refs_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(refs, f)
+    os.replace(tmp_path, refs_path)
+    
+    return refs
+
+
+def _read_tempo_file_kerchunk(file_path: str, parameters: List[str]) -> List[pd.DataFrame]:
+    """
+    Read a TEMPO file as a Zarr view over its HDF5 chunks and extract its measurement frames.
+    Chunk bytes are fetched through fsspec's ReferenceFileSystem, bypassing libhdf5.
+    """
+    refs = _kerchunk_refs(file_path)
+    
+    with xr.open_dataset(
+        'reference://',
+        engine='zarr',
+        backend_kwargs={'consolidated': False, 'storage_options': {'fo': refs}},
+        chunks={},
+        decode_times=True,
+        mask_and_scale=False,
+        decode_coords=False,
+        concat_characters=False
+    ) as ds:
+        return _read_tempo_dataset(ds, file_path, parameters)
+
+
+def _attr_str(value: Any) -> Optional[str]:
+    """
+    Normalize an HDF5 string attribute, which may be bytes or a one-element array.
+    """
+    if isinstance(value, np.ndarray):
+        value = value.reshape(-1)[0] if value.size else None
+    if isinstance(value, bytes):
+        value = value.decode()
+    return value
+
+
+def _time_axis(dset: h5py.Dataset) -> Optional[int]:
+    """
+    Axis of an HDF5 dataset attached to the netCDF time dimension, if any.
+    """
+    for axis, dim in enumerate(dset.dims):
+        if any(scale.name == '/time' for scale in dim.values()):
+            return axis
+    return None
+
+
+def _h5py_blocks(datasets: List[h5py.Dataset]):
+    """
+    Yield (start, stop, decoded) time blocks, one per on-disk time chunk of the first dataset.
+    Each dataset decompresses into its own scratch buffer, reused across blocks.
+    """
+    n_time = datasets[0].shape[-1]
+    step = datasets[0].chunks[-1]
+    buffers = [None] * len(datasets)
+    
+    for start in range(0, n_time, step):
+        stop = min(start + step, n_time)
+        decoded = []
+        for n, dset in enumerate(datasets):
+            shape = dset.shape[:-1] + (stop - start,)
+            if buffers[n] is None or buffers[n].shape != shape:
+                buffers[n] = np.empty(shape, dtype=dset.dtype)
+            dset.read_direct(buffers[n], source_sel=np.s_[..., start:stop])
+            decoded.append(_decode_values(dset, buffers[n]))
+        yield start, stop, decoded
+
+
+def _read_tempo_file_h5py(file_path: str, parameters: List[str]) -> Optional[List[pd.DataFrame]]:
+    """
+    Read a TEMPO file directly with h5py and extract its measurement frames.
+    
+    Each chunk-aligned time block is read through the HDF5 filter pipeline
+    straight into a preallocated buffer, with no xarray or dask layers.
+    
+    Returns:
+        List of measurement frames, or None when the file layout needs the xarray reader
+    """
+    with h5py.File(file_path, 'r') as f:
+        present_params = [param for param in parameters if param in f]
+        datasets = [f[param] for param in present_params]
+        
+        # Direct reads rely on chunked storage with time as the last axis
+        if any(dset.chunks is None or _time_axis(dset) != dset.ndim - 1 for dset in datasets):
+            return None
+        
+        for param in parameters:
+            if param not in f:
+                logger.warning(f"Parameter {param} not found in file {file_path}")
+        
+        # Get coordinates
+        lats = f['latitude'][...]
+        lons = f['longitude'][...]
+        time_var = f['time']
+        times = pd.to_datetime(xr.coding.times.decode_cf_datetime(
+            time_var[...],
+            _attr_str(time_var.attrs.get('units')),
+            _attr_str(time_var.attrs.get('calendar')) or 'standard'
+        ))
+        
+        return _extract_measurements(
+            file_path, present_params, lats, lons, times, _h5py_blocks(datasets)
+        )
+
+
+def _with_granule_id(frame: pd.DataFrame, granule_id: int) -> pd.DataFrame:
+    """
+    Tag every measurement with its granule, in place of per-row source metadata.
+    """
+    frame['granule_id'] = np.full(len(frame), granule_id, dtype=np.int32)
+    return frame
+
+
+def _process_tempo_file(file_path: str, parameters: List[str], granule_id: int = 0) -> pd.DataFrame:
+    """
+    Process a single TEMPO NetCDF file and extract measurements as a frame.
+    Module-level so it can be dispatched to worker processes.
+    
+    Args:
+        file_path: Local path of the granule
+        parameters: List of parameters to extract
+        granule_id: Identifier stored in the granule_id column of every row
+    """
+    frames = None
+    
+    try:
+        if _TEMPO_READER == 'h5py':
+            frames = _read_tempo_file_h5py(file_path, parameters)
+            if frames is None:
+                logger.info(f"{file_path} is not chunked along time; reading it with xarray")
+        elif _TEMPO_READER == 'kerchunk':
+            frames = _read_tempo_file_kerchunk(file_path, parameters)
+        
+        if frames is None:
+            frames = _read_tempo_file_xarray(file_path, parameters)
+        
+    except Exception as e:
+        logger.error(f"Error processing TEMPO file {file_path}: {e}")
+        frames = []
+    
+    return _with_granule_id(concat_measurement_frames(frames), granule_id)
+
+
+def _stream_tempo_file(fs: Any, url: str, parameters: List[str], granule_id: int = 0) -> pd.DataFrame:
+    """
+    Stream a remote TEMPO file over HTTPS and extract measurements without
+    writing it to disk. Reads are served from large read-ahead blocks.
+    """
+    try:
+        with fs.open(url, mode='rb', cache_type='readahead', block_size=_STREAM_BLOCK_SIZE) as fobj:
+            frames = _read_tempo_file_xarray(url, parameters, source=fobj)
+    except Exception as e:
+        logger.error(f"Error streaming TEMPO file {url}: {e}")
+        frames = []
+    
+    return _with_granule_id(concat_measurement_frames(frames), granule_id)
+
+
+def _process_tempo_file_to_parquet(file_path: str, parameters: List[str],
+                                   granule_id: int = 0) -> Tuple[Optional[str], int, Optional[str]]:
+    """
+    Process a single TEMPO NetCDF file and write its measurements next to it as Parquet.
+    
+    Returns:
+        Tuple of (Parquet path or None when nothing was written, record count,
+        error message or None)
+    """
+    frame = _process_tempo_file(file_path, parameters, granule_id)
+    if frame.empty:
+        return None, 0, None
+    
+    parquet_path = f"{os.path.splitext(file_path)[0]}.parquet"
+    try:
+        frame.to_parquet(parquet_path, engine='pyarrow', compression='zstd', index=False)
+    except Exception as e:
+        logger.error(f"Error writing TEMPO measurements to {parquet_path}: {e}")
+        return None, 0, f"Error writing {parquet_path}: {e}"
+    
+    return parquet_path, len(frame), None
+
+
+def _process_tempo_files(files: List[str], parameters: List[str], worker=_process_tempo_file) -> List[Any]:
+    """
+    Process TEMPO files in a process pool, one granule per task.
+    Each file's position in `files` is passed to the worker as its granule ID.
+    A single file is processed in-process to skip the pool start-up cost.
+    """
+    if len(files) <= 1:
+        return [worker(file_path, parameters, granule_id) for granule_id, file_path in enumerate(files)]
+    
+    max_workers = min(os.cpu_count() or 1, len(files))
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=_POOL_CONTEXT) as executor:
+        return list(executor.map(worker, files, repeat(parameters), range(len(files))))
+
+
+def _granules_table(files: List[str]) -> List[Dict[str, Any]]:
+    """
+    Granule-level metadata records, one per processed file, keyed by granule_id.
+    """
+    return [{'granule_id': granule_id, 'file_path': file_path} for granule_id, file_path in enumerate(files)]
+
+
 class TEMPOClient:
     """
     Client for accessing NASA TEMPO data through earthaccess.
     """
     
+    SHORT_NAME = "TEMPO_L2"
+    
+    # CMR search results shared across clients, keyed by (short_name, start, end, bbox)
+    _search_cache = TTLCache(maxsize=128, ttl=_CMR_CACHE_TTL)
+    _search_cache_lock = threading.Lock()
+    
+    # Persistent copy of the search cache, shared across processes and restarts
+    _search_disk_cache = None
+    _search_disk_cache_lock = threading.Lock()
+    
     def __init__(self, username: str = None, password: str = None):
         """
         Initialize TEMPO client with Earthdata credentials.
@@ -72,29 +967,104 @@ class TEMPOClient:
             # Default to North America bounding box
             bbox = [-180, 15, -50, 70]
         
+        # Callers round the search window to the hour, so repeat searches within
+        # that hour share a key; granules from a newer hour are never masked
+        cache_key = (self.SHORT_NAME, start_date.isoformat(), end_date.isoformat(), tuple(bbox))
+        with self._search_cache_lock:
+            cached = self._search_cache.get(cache_key)
+        if cached is None:
+            cached = self._load_cached_search(cache_key)
+            if cached is not None:
+                with self._search_cache_lock:
+                    self._search_cache[cache_key] = cached
+        if cached is not None:
+            logger.info(f"Using cached TEMPO search results ({len(cached)} granules)")
+            return list(cached)
+        
         try:
             logger.info(f"Searching TEMPO data from {start_date} to {end_date}")
             
             # Search for TEMPO Level 2 data
             results = earthaccess.search_data(
-                short_name="TEMPO_L2",
+                short_name=self.SHORT_NAME,
                 temporal=(start_date, end_date),
                 bounding_box=bbox,
                 count=100  # Limit results
             )
             
             logger.info(f"Found {len(results)} TEMPO granules")
+            
+            # Skip granules whose footprint cannot contain any city catchment
+            nearby = [granule for granule in results if _granule_near_cities(granule)]
+            if len(nearby) < len(results):
+                logger.info(f"Skipping {len(results) - len(nearby)} TEMPO granules away from all cities")
+            results = nearby
+            
+            # Granules are plain metadata dicts, so they are safe to keep around
+            if results:
+                with self._search_cache_lock:
+                    self._search_cache[cache_key] = list(results)
+                self._store_cached_search(cache_key, results)
             return results
             
         except Exception as e:
             logger.error(f"Error searching TEMPO data: {e}")
             return []
     
+    @classmethod
+    def _get_search_disk_cache(cls):
+        """
+        Open the on-disk search cache on first use; None when diskcache is not installed.
+        """
+        if diskcache is None:
+            return None
+        
+        with cls._search_disk_cache_lock:
+            if cls._search_disk_cache is None:
+                cls._search_disk_cache = diskcache.Cache(_CMR_CACHE_DIR)
+            return cls._search_disk_cache
+    
+    @classmethod
+    def _load_cached_search(cls, cache_key: Tuple) -> Optional[List[Any]]:
+        """
+        Load and rehydrate granules for a search from the on-disk cache.
+        """
+        try:
+            cache = cls._get_search_disk_cache()
+            records = cache.get(cache_key) if cache is not None else None
+            if records is None:
+                return None
+            return [
+                DataGranule(record['granule'], cloud_hosted=record['cloud_hosted'])
+                for record in records
+            ]
+        except Exception as e:
+            logger.warning(f"Could not read cached TEMPO search results: {e}")
+            return None
+    
+    @classmethod
+    def _store_cached_search(cls, cache_key: Tuple, granules: List[Any]) -> None:
+        """
+        Store the metadata of searched granules in the on-disk cache.
+        """
+        try:
+            cache = cls._get_search_disk_cache()
+            if cache is None:
+                return
+            records = [
+                {'granule': dict(granule), 'cloud_hosted': getattr(granule, 'cloud_hosted', False)}
+                for granule in granules
+            ]
+            cache.set(cache_key, records, expire=_CMR_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Could not write cached TEMPO search results: {e}")
+    
     def download_tempo_data(
         self,
         granules: List[Dict[str, Any]],
         download_path: str = "data/tempo/",
-        parameters: List[str] = None
+        parameters: List[str] = None,
+        to_parquet: bool = False
     ) -> Dict[str, Any]:
         """
         Download TEMPO data files.
@@ -103,9 +1073,14 @@ class TEMPOClient:
             granules: List of granule information from search
             download_path: Local path to save downloaded files
             parameters: List of parameters to extract
+            to_parquet: Write each granule's measurements to a zstd-compressed Parquet
+                file instead of returning them in memory
         
         Returns:
-            Dictionary with download results
+            Dictionary with download results; 'measurements' is a DataFrame, or
+            'parquet_files' lists the written files when to_parquet is set.
+            'granules' maps each measurement's granule_id to its file.
+            'error' is set when downloading, processing or writing failed.
         """
         if parameters is None:
             parameters = ["NO2", "O3", "HCHO", "H2CO"]
@@ -114,28 +1089,69 @@ class TEMPOClient:
         os.makedirs(download_path, exist_ok=True)
         
         downloaded_files = []
-        processed_measurements = []
+        frames = []
+        parquet_files = []
+        records_processed = 0
         
         try:
-            logger.info(f"Downloading {len(granules)} TEMPO granules to {download_path}")
+            # Fail before downloading anything if the Parquet engine is missing
+            if to_parquet and importlib.util.find_spec('pyarrow') is None:
+                raise ImportError("pyarrow is required for to_parquet=True")
+            
+            # Reuse granules already in the on-disk cache and only download the rest
+            files = []
+            missing = []
+            for granule in granules:
+                target = _granule_cache_path(granule, download_path)
+                if target is not None and target.exists() and target.stat().st_size > 0:
+                    files.append(str(target))
+                else:
+                    missing.append((granule, target))
+            
+            logger.info(f"Found {len(files)} of {len(granules)} TEMPO granules in cache at {download_path}")
+            
+            if missing:
+                logger.info(f"Downloading {len(missing)} TEMPO granules to {download_path}")
+                
+                # Download files, many granules at a time
+                downloaded = _download_granules(missing, download_path)
+                files.extend(downloaded)
+                
+                logger.info(f"Downloaded {len(downloaded)} files")
             
-            # Download files
-            files = earthaccess.download(granules, download_path)
             downloaded_files.extend(files)
             
-            logger.info(f"Downloaded {len(files)} files")
+            if to_parquet:
+                # Workers write their granule straight to disk and return only the path,
+                # so measurements never accumulate in this process
+                write_errors = []
+                for parquet_path, count, error in _process_tempo_files(
+                    files, parameters, worker=_process_tempo_file_to_parquet
+                ):
+                    if parquet_path is not None:
+                        parquet_files.append(parquet_path)
+                        records_processed += count
+                    if error is not None:
+                        write_errors.append(error)
+                
+                result = {
+                    'files': downloaded_files,
+                    'granules': _granules_table(downloaded_files),
+                    'download_path': download_path,
+                    'parquet_files': parquet_files,
+                    'records_processed': records_processed
+                }
+                if write_errors:
+                    result['error'] = f"{len(write_errors)} Parquet files could not be written; first: {write_errors[0]}"
+                return result
             
-            # Process each downloaded file
-            for file_path in files:
-                try:
-                    measurements = self._process_tempo_file(file_path, parameters)
-                    processed_measurements.extend(measurements)
-                except Exception as e:
-                    logger.error(f"Error processing file {file_path}: {e}")
-                    continue
+            # Process downloaded files across all cores; decoding and masking are CPU-bound
+            frames.extend(_process_tempo_files(files, parameters))
             
+            processed_measurements = concat_measurement_frames(frames)
             return {
                 'files': downloaded_files,
+                'granules': _granules_table(downloaded_files),
                 'download_path': download_path,
                 'measurements': processed_measurements,
                 'records_processed': len(processed_measurements)
@@ -143,144 +1159,95 @@ class TEMPOClient:
             
         except Exception as e:
             logger.error(f"Error downloading TEMPO data: {e}")
+            if to_parquet:
+                return {
+                    'files': downloaded_files,
+                    'granules': _granules_table(downloaded_files),
+                    'download_path': download_path,
+                    'parquet_files': parquet_files,
+                    'records_processed': records_processed,
+                    'error': str(e)
+                }
+            
+            processed_measurements = concat_measurement_frames(frames)
             return {
                 'files': downloaded_files,
+                'granules': _granules_table(downloaded_files),
                 'download_path': download_path,
                 'measurements': processed_measurements,
                 'records_processed': len(processed_measurements),
                 'error': str(e)
             }
     
-    def _process_tempo_file(self, file_path: str, parameters: List[str]) -> List[Dict[str, Any]]:
+    def stream_tempo_data(
+        self,
+        granules: List[Dict[str, Any]],
+        parameters: List[str] = None
+    ) -> Dict[str, Any]:
         """
-        Process a single TEMPO NetCDF file and extract measurements.
+        Stream TEMPO data files over HTTPS and process them without downloading.
+        
+        Args:
+            granules: List of granule information from search
+            parameters: List of parameters to extract
+        
+        Returns:
+            Dictionary with the streamed URLs and 'measurements' as a DataFrame;
+            'granules' maps each measurement's granule_id to its URL
         """
-        measurements = []
+        if parameters is None:
+            parameters = ["NO2", "O3", "HCHO", "H2CO"]
+        
+        urls = []
+        frames = []
         
         try:
-            # Open NetCDF file
-            ds = xr.open_dataset(file_path)
+            for granule in granules:
+                urls.extend(link for link in granule.data_links() if link.endswith('.nc'))
             
-            # Get coordinates
-            lats = ds.latitude.values
-            lons = ds.longitude.values
-            times = ds.time.values
+            logger.info(f"Streaming {len(urls)} TEMPO files")
             
-            # Process each parameter
-            for param in parameters:
-                if param not in ds.variables:
-                    logger.warning(f"Parameter {param} not found in file {file_path}")
-                    continue
-                
-                # Get parameter data
-                param_data = ds[param].values
-                
-                # Get valid data (not NaN)
-                valid_mask = ~np.isnan(param_data)
-                
-                if not np.any(valid_mask):
-                    continue
-                
-                # Get valid indices
-                valid_indices = np.where(valid_mask)
-                
-                # Extract measurements
-                for i, j, k in zip(valid_indices[0], valid_indices[1], valid_indices[2]):
-                    try:
-                        lat = float(lats[i, j])
-                        lon = float(lons[i, j])
-                        time_val = times[k]
-                        value = float(param_data[i, j, k])
-                        
-                        # Convert time to datetime
-                        if hasattr(time_val, 'item'):
-                            time_val = time_val.item()
-                        
-                        if isinstance(time_val, np.datetime64):
-                            dt = pd.to_datetime(time_val).to_pydatetime()
-                        else:
-                            dt = datetime.fromisoformat(str(time_val))
-                        
-                        # Determine city based on coordinates (simplified)
-                        city = self._get_city_from_coords(lat, lon)
-                        
-                        # Map TEMPO parameters to standard names
-                        param_mapping = {
-                            'NO2': 'NO2',
-                            'O3': 'O3',
-                            'HCHO': 'HCHO',
-                            'H2CO': 'HCHO'  # Map H2CO to HCHO
-                        }
-                        mapped_param = param_mapping.get(param, param)
-                        
-                        measurement = {
-                            'city': city,
-                            'parameter': mapped_param,
-                            'value': value,
-                            'unit': 'mol/m²',  # TEMPO units
-                            'date_utc': dt,
-                            'source': 'tempo',
-                            'latitude': lat,
-                            'longitude': lon,
-                            'raw_data': {
-                                'file_path': file_path,
-                                'original_parameter': param
-                            }
-                        }
-                        
-                        measurements.append(measurement)
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing measurement at ({i}, {j}, {k}): {e}")
-                        continue
+            # Authenticated fsspec HTTPS session shared by all files
+            fs = earthaccess.get_fsspec_https_session()
+            for granule_id, url in enumerate(urls):
+                frames.append(_stream_tempo_file(fs, url, parameters, granule_id))
             
-            ds.close()
+            processed_measurements = concat_measurement_frames(frames)
+            return {
+                'files': urls,
+                'granules': _granules_table(urls),
+                'measurements': processed_measurements,
+                'records_processed': len(processed_measurements)
+            }
             
         except Exception as e:
-            logger.error(f"Error processing TEMPO file {file_path}: {e}")
-        
-        return measurements
+            logger.error(f"Error streaming TEMPO data: {e}")
+            processed_measurements = concat_measurement_frames(frames)
+            return {
+                'files': urls,
+                'granules': _granules_table(urls),
+                'measurements': processed_measurements,
+                'records_processed': len(processed_measurements),
+                'error': str(e)
+            }
+    
+    def _process_tempo_file(self, file_path: str, parameters: List[str]) -> pd.DataFrame:
+        """
+        Process a single TEMPO NetCDF file and extract measurements.
+        """
+        return _process_tempo_file(file_path, parameters)
     
     def _get_city_from_coords(self, lat: float, lon: float) -> str:
         """
         Determine city name from latitude and longitude coordinates.
-        This is a simplified implementation - in production, you'd use a proper geocoding service.
         """
-        # Simple coordinate-based city mapping for North America
-        city_mapping = [
-            (40.7128, -74.0060, "New York"),
-            (34.0522, -118.2437, "Los Angeles"),
-            (41.8781, -87.6298, "Chicago"),
-            (29.7604, -95.3698, "Houston"),
-            (33.4484, -112.0740, "Phoenix"),
-            (39.9526, -75.1652, "Philadelphia"),
-            (32.7767, -96.7970, "Dallas"),
-            (37.7749, -122.4194, "San Francisco"),
-            (39.7392, -104.9903, "Denver"),
-            (47.6062, -122.3321, "Seattle"),
-            (25.7617, -80.1918, "Miami"),
-            (42.3601, -71.0589, "Boston"),
-            (43.6532, -79.3832, "Toronto"),
-            (45.5017, -73.5673, "Montreal"),
-            (49.2827, -123.1207, "Vancouver"),
-        ]
-        
-        # Find closest city (simplified distance calculation)
-        min_distance = float('inf')
-        closest_city = "Unknown"
-        
-        for city_lat, city_lon, city_name in city_mapping:
-            distance = ((lat - city_lat) ** 2 + (lon - city_lon) ** 2) ** 0.5
-            if distance < min_distance:
-                min_distance = distance
-                closest_city = city_name
-        
-        return closest_city
+        return _get_city_from_coords(lat, lon)
     
     def get_recent_tempo_data(
         self,
         days_back: int = 7,
-        parameters: List[str] = None
+        parameters: List[str] = None,
+        stream: bool = False
     ) -> Dict[str, Any]:
         """
         Get recent TEMPO data for the last N days.
@@ -288,12 +1255,14 @@ class TEMPOClient:
         Args:
             days_back: Number of days to look back
             parameters: List of parameters to fetch
+            stream: Stream files over HTTPS instead of downloading them to disk
         
         Returns:
             Dictionary with processed measurements
         """
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days_back)
+        # Round to the hour and day so repeat queries hit the search and HTTP caches
+        end_date = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        start_date = (end_date - timedelta(days=days_back)).replace(hour=0)
         
         # Search for data
         granules = self.search_tempo_data(start_date, end_date, parameters=parameters)
@@ -302,10 +1271,14 @@ class TEMPOClient:
             logger.warning("No TEMPO granules found for the specified time period")
             return {
                 'files': [],
+                'granules': [],
                 'download_path': '',
-                'measurements': [],
+                'measurements': concat_measurement_frames([]),
                 'records_processed': 0
             }
         
+        if stream:
+            return self.stream_tempo_data(granules, parameters=parameters)
+        
         # Download and process data
         return self.download_tempo_data(granules, parameters=parameters)